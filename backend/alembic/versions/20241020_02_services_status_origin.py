@@ -0,0 +1,22 @@
+"""services status/origin index
+
+Revision ID: 20241020_02
+Revises: 20241001_01
+Create Date: 2024-10-20
+"""
+
+from alembic import op
+
+
+revision = "20241020_02"
+down_revision = "20241001_01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_services_status_origin", "services", ["status", "origin_lat", "origin_lng"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_services_status_origin", table_name="services")
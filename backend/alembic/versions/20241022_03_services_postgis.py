@@ -0,0 +1,38 @@
+"""services postgis geography columns
+
+Revision ID: 20241022_03
+Revises: 20241020_02
+Create Date: 2024-10-22
+"""
+
+from alembic import op
+
+
+revision = "20241022_03"
+down_revision = "20241020_02"
+branch_labels = None
+depends_on = None
+
+
+def _geography(lat: str, lng: str) -> str:
+    return f"geography(ST_SetSRID(ST_MakePoint({lng}, {lat}), 4326))"
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    for prefix in ("origin", "dest"):
+        op.execute(
+            f"ALTER TABLE services ADD COLUMN {prefix}_geog geography(Point, 4326) "
+            f"GENERATED ALWAYS AS ({_geography(f'{prefix}_lat', f'{prefix}_lng')}) STORED"
+        )
+        op.execute(f"CREATE INDEX ix_services_{prefix}_geog ON services USING GIST ({prefix}_geog)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for prefix in ("origin", "dest"):
+        op.execute(f"DROP INDEX IF EXISTS ix_services_{prefix}_geog")
+        op.execute(f"ALTER TABLE services DROP COLUMN IF EXISTS {prefix}_geog")
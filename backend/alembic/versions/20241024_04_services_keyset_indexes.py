@@ -0,0 +1,26 @@
+"""services keyset pagination indexes
+
+Revision ID: 20241024_04
+Revises: 20241022_03
+Create Date: 2024-10-24
+"""
+
+from alembic import op
+
+
+revision = "20241024_04"
+down_revision = "20241022_03"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_services_status_created", "services", ["status", "created_at", "id"])
+    op.create_index(
+        "ix_services_owner_created", "services", ["created_by_user_id", "created_at", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_services_owner_created", table_name="services")
+    op.drop_index("ix_services_status_created", table_name="services")
@@ -0,0 +1,85 @@
+"""services trip metrics
+
+Revision ID: 20241026_05
+Revises: 20241024_04
+Create Date: 2024-10-26
+"""
+
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20241026_05"
+down_revision = "20241024_04"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+EARTH_RADIUS_KM = 6371.0
+
+
+def trip_metrics(origin_lat, origin_lng, dest_lat, dest_lng, offered_price):
+    """Great-circle trip length and price per km, frozen as of this revision."""
+    dlat = math.radians(dest_lat - origin_lat)
+    dlon = math.radians(dest_lng - origin_lng)
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(math.radians(origin_lat))
+        * math.cos(math.radians(dest_lat))
+        * math.sin(dlon / 2) ** 2
+    )
+    trip = EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return trip, float(offered_price) / max(trip, 1)
+
+
+def upgrade() -> None:
+    op.add_column("services", sa.Column("trip_km", sa.Float(), nullable=True))
+    op.add_column("services", sa.Column("price_per_km", sa.Float(), nullable=True))
+
+    services = sa.table(
+        "services",
+        sa.column("id", sa.Integer()),
+        sa.column("origin_lat", sa.Float()),
+        sa.column("origin_lng", sa.Float()),
+        sa.column("dest_lat", sa.Float()),
+        sa.column("dest_lng", sa.Float()),
+        sa.column("offered_price", sa.Numeric(12, 2)),
+        sa.column("trip_km", sa.Float()),
+        sa.column("price_per_km", sa.Float()),
+    )
+    bind = op.get_bind()
+    update = (
+        sa.update(services)
+        .where(services.c.id == sa.bindparam("b_id"))
+        .values(trip_km=sa.bindparam("b_trip_km"), price_per_km=sa.bindparam("b_price_per_km"))
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                services.c.id,
+                services.c.origin_lat,
+                services.c.origin_lng,
+                services.c.dest_lat,
+                services.c.dest_lng,
+                services.c.offered_price,
+            )
+            .where(services.c.id > last_id)
+            .order_by(services.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        params = []
+        for row in rows:
+            trip, price_per_km = trip_metrics(*row[1:])
+            params.append({"b_id": row.id, "b_trip_km": trip, "b_price_per_km": price_per_km})
+        bind.execute(update, params)
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    op.drop_column("services", "price_per_km")
+    op.drop_column("services", "trip_km")
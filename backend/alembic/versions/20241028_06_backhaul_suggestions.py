@@ -0,0 +1,38 @@
+"""backhaul suggestions
+
+Revision ID: 20241028_06
+Revises: 20241026_05
+Create Date: 2024-10-28
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20241028_06"
+down_revision = "20241026_05"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "backhaul_suggestions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("driver_user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("service_id", sa.Integer(), sa.ForeignKey("services.id"), nullable=False),
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("pickup_distance_km", sa.Float(), nullable=False),
+        sa.Column("detour_distance_km", sa.Float(), nullable=False),
+        sa.Column("origin_to_dest_km", sa.Float(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_backhaul_suggestions_driver_user_id", "backhaul_suggestions", ["driver_user_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_backhaul_suggestions_driver_user_id", table_name="backhaul_suggestions")
+    op.drop_table("backhaul_suggestions")
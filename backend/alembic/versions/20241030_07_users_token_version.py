@@ -0,0 +1,25 @@
+"""users token version
+
+Revision ID: 20241030_07
+Revises: 20241028_06
+Create Date: 2024-10-30
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20241030_07"
+down_revision = "20241028_06"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users", sa.Column("token_version", sa.Integer(), nullable=False, server_default="0")
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "token_version")
@@ -0,0 +1,25 @@
+"""services version
+
+Revision ID: 20241101_08
+Revises: 20241030_07
+Create Date: 2024-11-01
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20241101_08"
+down_revision = "20241030_07"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "services", sa.Column("version", sa.Integer(), nullable=False, server_default="1")
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("services", "version")
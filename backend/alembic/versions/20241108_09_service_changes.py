@@ -0,0 +1,33 @@
+"""service changes
+
+Revision ID: 20241108_09
+Revises: 20241101_08
+Create Date: 2024-11-08
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20241108_09"
+down_revision = "20241101_08"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "service_changes",
+        sa.Column("seq", sa.Integer(), primary_key=True),
+        sa.Column("service_id", sa.Integer(), sa.ForeignKey("services.id"), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+    )
+    # seed the log so a client syncing from 0 sees every existing service
+    op.execute(
+        "INSERT INTO service_changes (service_id, changed_at) "
+        "SELECT id, created_at FROM services ORDER BY id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("service_changes")
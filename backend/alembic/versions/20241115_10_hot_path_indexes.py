@@ -0,0 +1,49 @@
+"""hot path indexes
+
+Revision ID: 20241115_10
+Revises: 20241108_09
+Create Date: 2024-11-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20241115_10"
+down_revision = "20241108_09"
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    # declared index=True on the model but never created by the init migration
+    op.create_index("ix_offers_driver_user_id", "offers", ["driver_user_id"])
+    # my_assignment: latest assignment of a driver
+    op.create_index("ix_assignments_driver_id", "assignments", ["driver_user_id", "id"])
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # Feed, backhaul and the open-service index only ever read PUBLICADO rows;
+    # a partial index keeps them off the much larger history of closed services.
+    op.create_index(
+        "ix_services_open_created",
+        "services",
+        ["created_at", "id"],
+        postgresql_where=sa.text("status = 'PUBLICADO'"),
+    )
+    if _has_column("services", "origin_geog"):
+        op.execute(
+            "CREATE INDEX ix_services_open_origin_geog ON services "
+            "USING GIST (origin_geog) WHERE status = 'PUBLICADO'"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_services_open_origin_geog")
+        op.drop_index("ix_services_open_created", table_name="services")
+    op.drop_index("ix_assignments_driver_id", table_name="assignments")
+    op.drop_index("ix_offers_driver_user_id", table_name="offers")
@@ -1,22 +1,126 @@
+import secrets
+import time
+from dataclasses import dataclass
+
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.db import get_db
-from app.core.security import decode_token
-from app.models.models import User
+from app.core.security import decode_claims, password_executor
+from app.models.models import User, UserRole
+from app.services.cache import TTLCache
 
 bearer = HTTPBearer()
+internal_bearer = HTTPBearer(auto_error=False)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller, built from the token claims instead of a ``users`` row."""
+
+    id: int
+    name: str
+    email: str
+    role: UserRole
+    token_version: int
+
+
+def token_claims(user: User) -> dict:
+    return {
+        "name": user.name,
+        "email": user.email,
+        "role": user.role.value,
+        "ver": user.token_version or 0,
+    }
+
+
+# token -> (exp, Principal); user id -> current token_version
+token_cache = TTLCache(
+    max_entries=settings.auth_token_cache_max_entries,
+    ttl_seconds=settings.auth_token_cache_ttl_seconds,
+)
+user_versions = TTLCache(
+    max_entries=settings.auth_token_cache_max_entries,
+    ttl_seconds=settings.auth_user_version_ttl_seconds,
+)
+
+
+async def _principal(token: str, db: AsyncSession) -> Principal:
+    cached = token_cache.get(token)
+    if cached is not None and cached[0] > time.time():
+        return cached[1]
+    claims = decode_claims(token)
+    if not claims or not claims.get("sub"):
+        raise HTTPException(status_code=401, detail="Token inválido")
+    if "role" in claims:
+        principal = Principal(
+            id=int(claims["sub"]),
+            name=claims["name"],
+            email=claims["email"],
+            role=UserRole(claims["role"]),
+            token_version=claims.get("ver", 0),
+        )
+    else:
+        user = await db.get(User, int(claims["sub"]))
+        if not user:
+            raise HTTPException(status_code=401, detail="Usuário não encontrado")
+        principal = Principal(user.id, user.name, user.email, user.role, 0)
+    token_cache.set(token, (claims["exp"], principal))
+    return principal
 
 
-def current_user(
+async def current_user(
     creds: HTTPAuthorizationCredentials = Depends(bearer),
-    db: Session = Depends(get_db),
-) -> User:
-    user_id = decode_token(creds.credentials)
-    if not user_id:
+    db: AsyncSession = Depends(get_db),
+) -> Principal:
+    """Resolve the caller from the bearer token.
+
+    Identity and role come from the token itself. The only database read is the
+    user's ``token_version``, cached for ``auth_user_version_ttl_seconds``, so a
+    bumped version (logout everywhere, role change) revokes older tokens on
+    every worker within that window.
+    """
+    principal = await _principal(creds.credentials, db)
+    version = user_versions.get(principal.id)
+    if version is None:
+        version = await db.scalar(select(User.token_version).where(User.id == principal.id))
+        if version is None:
+            raise HTTPException(status_code=401, detail="Usuário não encontrado")
+        user_versions.set(principal.id, version)
+    if version != principal.token_version:
+        raise HTTPException(status_code=401, detail="Token revogado")
+    return principal
+
+
+async def revoke_tokens(db: AsyncSession, user_id: int) -> None:
+    """Invalidate every token issued to ``user_id`` so far."""
+    await db.execute(
+        update(User).where(User.id == user_id).values(token_version=User.token_version + 1)
+    )
+    await db.commit()
+    user_versions.pop(user_id)
+
+
+async def require_internal(
+    creds: HTTPAuthorizationCredentials | None = Depends(internal_bearer),
+) -> None:
+    """Let only callers holding ``internal_token`` reach operational endpoints.
+
+    Without a configured token the endpoints are hidden behind a 404.
+    """
+    if not settings.internal_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if creds is None or not secrets.compare_digest(creds.credentials, settings.internal_token):
         raise HTTPException(status_code=401, detail="Token inválido")
-    user = db.get(User, int(user_id))
-    if not user:
-        raise HTTPException(status_code=401, detail="Usuário não encontrado")
-    return user
+
+
+async def password_admission():
+    """Refuse password work with 503 while the hashing executor is saturated.
+
+    Declare it before ``get_db`` so a refused request never opens a database session.
+    """
+    with password_executor.admit():
+        yield
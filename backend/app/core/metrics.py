@@ -0,0 +1,147 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestSQL:
+    """SQL statements and DB time attributed to the request being served."""
+
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+class RouteSeries:
+    __slots__ = ("buckets", "count", "seconds", "db_queries", "db_seconds")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+_current_sql: ContextVar[RequestSQL | None] = ContextVar("current_sql", default=None)
+
+
+class RequestMetrics:
+    """Per-worker latency histograms keyed by (method, route template, status).
+
+    Series are only written from the event loop thread once the response has
+    been sent, so the counters need no lock; each worker process exposes its own
+    numbers and Prometheus sums them across scrape targets.
+    """
+
+    def __init__(self):
+        self.series: dict[tuple[str, str, int], RouteSeries] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, sql: RequestSQL):
+        key = (method, route, status)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = RouteSeries()
+        series.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        series.count += 1
+        series.seconds += seconds
+        series.db_queries += sql.queries
+        series.db_seconds += sql.seconds
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        db_queries, db_seconds = [], []
+        for (method, route, status), s in sorted(self.series.items()):
+            labels = f'method="{method}",route="{route}",status="{status}"'
+            cumulative = 0
+            for bound, n in zip((*LATENCY_BUCKETS, "+Inf"), s.buckets):
+                cumulative += n
+                lines.append(
+                    f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {s.seconds:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {s.count}")
+            db_queries.append(f"http_request_db_queries_total{{{labels}}} {s.db_queries}")
+            db_seconds.append(f"http_request_db_seconds_total{{{labels}}} {s.db_seconds:.6f}")
+        lines += [
+            "# HELP http_request_db_queries_total SQL statements executed while serving requests.",
+            "# TYPE http_request_db_queries_total counter",
+            *db_queries,
+            "# HELP http_request_db_seconds_total Time in SQL statements while serving requests.",
+            "# TYPE http_request_db_seconds_total counter",
+            *db_seconds,
+        ]
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request against its route template.
+
+    Routes in ``untimed`` (long-lived streams) are left out of the histograms,
+    where every connection would otherwise land in the ``+Inf`` bucket.
+    """
+
+    def __init__(
+        self, app, metrics: RequestMetrics = request_metrics, untimed: frozenset[str] = frozenset()
+    ):
+        self.app = app
+        self.metrics = metrics
+        self.untimed = untimed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        sql = RequestSQL()
+        token = _current_sql.set(sql)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_sql.reset(token)
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            if template not in self.untimed:
+                self.metrics.observe(scope["method"], template, status, elapsed, sql)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_sql.get() is not None:
+        conn.info["metrics_query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sql = _current_sql.get()
+    start = conn.info.pop("metrics_query_start", None)
+    if sql is not None and start is not None:
+        sql.queries += 1
+        sql.seconds += time.perf_counter() - start
+
+
+def instrument_sql(target=Engine) -> None:
+    """Attribute SQL statements to the current request; defaults to every engine."""
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
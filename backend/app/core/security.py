@@ -1,14 +1,75 @@
+import asyncio
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
+from typing import Any
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min = max = default, so hashes made with any other cost are flagged for rehash on login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
 ALGORITHM = "HS256"
 
 
+class HasherBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
+
+class BoundedExecutor:
+    """Thread pool that refuses work instead of queueing past ``max_pending`` jobs.
+
+    bcrypt releases the GIL, so a few dedicated threads keep hashing off the
+    shared request threadpool and off the event loop.
+    """
+
+    def __init__(self, workers: int, max_pending: int, name: str):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._admission = threading.BoundedSemaphore(workers + max_pending)
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """Reserve room for one job up front, so a request is refused before doing other work."""
+        if not self._admission.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            yield
+        finally:
+            self._admission.release()
+
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+
+password_executor = BoundedExecutor(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    name="password-hash",
+)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -17,15 +78,32 @@ def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def create_access_token(subject: str) -> str:
+async def hash_password_async(password: str) -> str:
+    return await password_executor.run(hash_password, password)
+
+
+async def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """``(valid, new_hash)``; ``new_hash`` is set when the stored cost is outdated."""
+    return await password_executor.run(
+        pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
+def create_access_token(subject: str, **claims) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.jwt_expire_minutes)
-    payload = {"sub": subject, "exp": expire}
+    payload = {**claims, "sub": subject, "exp": expire}
     return jwt.encode(payload, settings.jwt_secret, algorithm=ALGORITHM)
 
 
-def decode_token(token: str) -> str | None:
+def decode_claims(token: str) -> dict | None:
     try:
-        payload = jwt.decode(token, settings.jwt_secret, algorithms=[ALGORITHM])
+        return jwt.decode(token, settings.jwt_secret, algorithms=[ALGORITHM])
     except JWTError:
         return None
-    return payload.get("sub")
+
+
+def decode_token(token: str) -> str | None:
+    claims = decode_claims(token)
+    return claims.get("sub") if claims else None
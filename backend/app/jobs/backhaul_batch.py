@@ -0,0 +1,41 @@
+"""Precompute backhaul suggestions for every active driver intent.
+
+    python -m app.jobs.backhaul_batch --workers 4 --every 300
+"""
+
+import argparse
+import time
+
+from app.core.db import SessionLocal
+from app.services.batch_matching import run_backhaul_batch
+from app.services.matching import BACKHAUL_TOP_K
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--radius-km", type=float, default=200)
+    parser.add_argument("--top-k", type=int, default=BACKHAUL_TOP_K)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--shard-deg", type=float, default=5.0, help="region shard size")
+    parser.add_argument("--every", type=float, default=None, help="repeat every N seconds")
+    args = parser.parse_args()
+
+    while True:
+        start = time.perf_counter()
+        with SessionLocal() as db:
+            result = run_backhaul_batch(
+                db, args.radius_km, args.top_k, workers=args.workers, shard_deg=args.shard_deg
+            )
+        elapsed = time.perf_counter() - start
+        print(
+            f"{result.drivers} drivers x {result.services} services in {result.shards} shards: "
+            f"{result.suggestions} suggestions in {elapsed:.2f}s",
+            flush=True,
+        )
+        if args.every is None:
+            break
+        time.sleep(max(args.every - elapsed, 0))
+
+
+if __name__ == "__main__":
+    main()
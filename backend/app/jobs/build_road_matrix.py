@@ -0,0 +1,109 @@
+"""Build the hub-to-hub road distance/time matrix the API memory-maps.
+
+    python -m app.jobs.build_road_matrix --from-services 3000 \\
+        --osrm-url http://localhost:5000 -o /data/road_matrix.bin
+    python -m app.jobs.build_road_matrix --hubs hubs.csv --osrm-url http://osrm:5000 -o roads.bin
+
+Hubs come from a CSV with ``lat`` and ``lng`` columns, or are the busiest
+grid cells of service origins and destinations. Distances and durations come
+from an OSRM ``table`` service in ``--block`` x ``--block`` tiles. Point the
+API at the result with ``ROAD_MATRIX_PATH``; the file is replaced atomically.
+"""
+
+import argparse
+import csv
+import sys
+import time
+
+import httpx
+import numpy as np
+from sqlalchemy import func, literal, select, union_all
+
+from app.core.db import SessionLocal
+from app.models.models import Service
+from app.services.road_matrix import build_road_matrix
+
+
+def hubs_from_csv(path: str) -> tuple[np.ndarray, np.ndarray]:
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [(float(r["lat"]), float(r["lng"])) for r in csv.DictReader(f)]
+    return np.array([r[0] for r in rows]), np.array([r[1] for r in rows])
+
+
+def hubs_from_services(limit: int, cell_deg: float) -> tuple[np.ndarray, np.ndarray]:
+    """Centroids of the ``limit`` grid cells with the most service origins and destinations."""
+    points = union_all(
+        select(Service.origin_lat.label("lat"), Service.origin_lng.label("lng")),
+        select(Service.dest_lat.label("lat"), Service.dest_lng.label("lng")),
+    ).subquery()
+    cell_lat = func.floor(points.c.lat / literal(cell_deg))
+    cell_lng = func.floor(points.c.lng / literal(cell_deg))
+    query = (
+        select(func.avg(points.c.lat), func.avg(points.c.lng))
+        .group_by(cell_lat, cell_lng)
+        .order_by(func.count().desc())
+        .limit(limit)
+    )
+    with SessionLocal() as db:
+        rows = db.execute(query).all()
+    return np.array([r[0] for r in rows]), np.array([r[1] for r in rows])
+
+
+def osrm_table(base_url: str, client: httpx.Client):
+    """A ``TableFn`` backed by OSRM's ``/table/v1/driving`` endpoint."""
+
+    def table(src_lat, src_lng, dst_lat, dst_lng):
+        coords = [*zip(src_lng, src_lat), *zip(dst_lng, dst_lat)]
+        path = ";".join(f"{lng:.5f},{lat:.5f}" for lng, lat in coords)
+        n = len(src_lat)
+        params = {
+            "sources": ";".join(map(str, range(n))),
+            "destinations": ";".join(map(str, range(n, len(coords)))),
+            "annotations": "distance,duration",
+        }
+        r = client.get(f"{base_url}/table/v1/driving/{path}", params=params)
+        r.raise_for_status()
+        body = r.json()
+        km = np.array(body["distances"], dtype=np.float64) / 1000
+        minutes = np.array(body["durations"], dtype=np.float64) / 60
+        return km, minutes  # null (no route) became NaN
+
+    return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    hubs = parser.add_mutually_exclusive_group(required=True)
+    hubs.add_argument("--hubs", help="CSV with lat,lng columns")
+    hubs.add_argument("--from-services", type=int, metavar="N", help="busiest N service cells")
+    parser.add_argument("--hub-cell-deg", type=float, default=0.25)
+    parser.add_argument("--osrm-url", required=True)
+    parser.add_argument("--cell-deg", type=float, default=0.1, help="snapping grid resolution")
+    parser.add_argument("--snap-km", type=float, default=50, help="farthest point-to-hub snap")
+    parser.add_argument("--block", type=int, default=100, help="OSRM table tile size")
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+
+    if args.hubs:
+        hub_lat, hub_lng = hubs_from_csv(args.hubs)
+    else:
+        hub_lat, hub_lng = hubs_from_services(args.from_services, args.hub_cell_deg)
+    start = time.perf_counter()
+    with httpx.Client(timeout=300) as client:
+        build_road_matrix(
+            args.output,
+            hub_lat,
+            hub_lng,
+            osrm_table(args.osrm_url.rstrip("/"), client),
+            cell_deg=args.cell_deg,
+            snap_km=args.snap_km,
+            block=args.block,
+        )
+    print(
+        f"{len(hub_lat)} hubs written to {args.output} in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
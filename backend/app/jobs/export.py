@@ -0,0 +1,54 @@
+"""Stream a full dump of services, offers or assignments as NDJSON or CSV.
+
+    python -m app.jobs.export services --since 2024-10-01 --gzip -o services.ndjson.gz
+    python -m app.jobs.export offers --format csv > offers.csv
+
+Runs outside the API workers on a server-side cursor, so memory stays flat
+however many rows are exported.
+"""
+
+import argparse
+import gzip
+import io
+import sys
+import time
+from datetime import datetime
+
+from app.core.db import SessionLocal
+from app.services.export import EXPORTS, WRITERS, export_table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("table", choices=sorted(EXPORTS))
+    parser.add_argument("--format", choices=sorted(WRITERS), default="ndjson")
+    parser.add_argument(
+        "--since", type=datetime.fromisoformat, help="only rows created at or after (ISO date)"
+    )
+    parser.add_argument("--gzip", action="store_true", help="compress the output on the fly")
+    parser.add_argument("-o", "--output", default="-", help="file path, or - for stdout")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    raw = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    binary = gzip.GzipFile(fileobj=raw, mode="wb") if args.gzip else raw
+    out = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+    start = time.perf_counter()
+    try:
+        with SessionLocal() as db:
+            count = export_table(db, args.table, out, args.format, args.since, args.batch_size)
+    finally:
+        out.flush()
+        out.detach()
+        if args.gzip:
+            binary.close()
+        if raw is not sys.stdout.buffer:
+            raw.close()
+    print(
+        f"{count} {args.table} rows exported in {time.perf_counter() - start:.2f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,38 @@
-from fastapi import Depends, FastAPI, HTTPException, Query
-from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import and_, select
-from sqlalchemy.orm import Session
+import asyncio
+from collections.abc import Callable
+from datetime import datetime
 
-from app.api.deps import current_user
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import Select, and_, case, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import (
+    Principal,
+    current_user,
+    password_admission,
+    require_internal,
+    revoke_tokens,
+    token_cache,
+    token_claims,
+    user_versions,
+)
 from app.core.config import settings
-from app.core.db import get_db
-from app.core.security import create_access_token, hash_password, verify_password
+from app.core.db import async_engine, get_db
+from app.core.metrics import MetricsMiddleware, instrument_sql, request_metrics
+from app.core.pool import pool_stats
+from app.core.security import (
+    HasherBusy,
+    create_access_token,
+    hash_password_async,
+    verify_and_update_password,
+)
 from app.models.models import (
     Assignment,
+    BackhaulSuggestion,
     DriverIntent,
     DriverProfile,
     Offer,
@@ -19,21 +43,48 @@ from app.models.models import (
     ShipperProfile,
     User,
     UserRole,
+    trip_metrics,
 )
 from app.schemas.schemas import (
     BackhaulOut,
+    BulkRowError,
+    BulkServicesOut,
     DriverIntentIn,
     LoginIn,
     OfferIn,
     OfferOut,
     RegisterIn,
+    ServiceChangesOut,
     ServiceIn,
     ServiceOut,
     ServicePatch,
+    ServiceSummaryOut,
     TokenOut,
     UserOut,
 )
-from app.services.geo import haversine_km
+from app.services.backhaul_cache import backhaul_cache, backhaul_key, invalidate_backhaul_area
+from app.services.bulk_import import RowError, upload_format, validated_rows
+from app.services.change_feed import (
+    CHANGE_ROWS,
+    changed_services,
+    record_changes,
+    visible_upto,
+)
+from app.services.fast_json import RowEncoder
+from app.services.live_feed import service_feed
+from app.services.matching import BACKHAUL_TOP_K, backhaul_scores, top_k
+from app.services.pagination import decode_cursor, encode_cursor
+from app.services.response_cache import (
+    CachedResponse,
+    etag_matches,
+    list_cache,
+    service_etag,
+    strong_etag,
+)
+from app.services.road_matrix import road_legs, road_matrix
+from app.services.search import backhaul_candidates, services_near
+from app.services.spatial_index import open_services
+from app.services.time_windows import driver_availability
 
 app = FastAPI(title="Easy Tips API", version="0.1.0")
 app.add_middleware(
@@ -42,261 +93,836 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(MetricsMiddleware, untimed=frozenset({"/services/stream"}))
+instrument_sql()
 
+PAGE_LIMIT = Query(50, ge=1, le=200)
 
-@app.post("/auth/register", response_model=UserOut)
-def register(payload: RegisterIn, db: Session = Depends(get_db)):
-    if db.scalar(select(User).where(User.email == payload.email)):
-        raise HTTPException(status_code=400, detail="Email já cadastrado")
+
+@app.exception_handler(HasherBusy)
+async def hasher_busy_handler(request: Request, exc: HasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado, tente novamente"},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _create_user(db: AsyncSession, payload: RegisterIn, password_hash: str) -> User:
     user = User(
         name=payload.name,
         email=payload.email,
-        password_hash=hash_password(payload.password),
+        password_hash=password_hash,
         role=payload.role,
     )
     db.add(user)
-    db.flush()
+    await db.flush()
     if payload.role in [UserRole.DRIVER, UserRole.BOTH]:
         db.add(DriverProfile(user_id=user.id))
     if payload.role in [UserRole.SHIPPER, UserRole.BOTH]:
         db.add(ShipperProfile(user_id=user.id, profile_type="PF"))
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
+@app.post("/auth/register", response_model=UserOut)
+async def register(
+    payload: RegisterIn,
+    _: None = Depends(password_admission),
+    db: AsyncSession = Depends(get_db),
+):
+    if await db.scalar(select(User).where(User.email == payload.email)):
+        raise HTTPException(status_code=400, detail="Email já cadastrado")
+    password_hash = await hash_password_async(payload.password)
+    return await _create_user(db, payload, password_hash)
+
+
 @app.post("/auth/login", response_model=TokenOut)
-def login(payload: LoginIn, db: Session = Depends(get_db)):
-    user = db.scalar(select(User).where(User.email == payload.email))
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(
+    payload: LoginIn,
+    _: None = Depends(password_admission),
+    db: AsyncSession = Depends(get_db),
+):
+    user = await db.scalar(select(User).where(User.email == payload.email))
+    if not user:
+        raise HTTPException(status_code=401, detail="Credenciais inválidas")
+    valid, new_hash = await verify_and_update_password(payload.password, user.password_hash)
+    if not valid:
         raise HTTPException(status_code=401, detail="Credenciais inválidas")
-    return TokenOut(access_token=create_access_token(str(user.id)))
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+    return TokenOut(access_token=create_access_token(str(user.id), **token_claims(user)))
+
+
+@app.post("/auth/logout-all")
+async def logout_all(user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
+    await revoke_tokens(db, user.id)
+    return {"ok": True}
 
 
 @app.get("/me", response_model=UserOut)
-def me(user: User = Depends(current_user)):
+async def me(user: Principal = Depends(current_user)):
     return user
 
 
-def require_shipper(user: User):
+def _service_changed(service: Service, was_open: bool, created: bool = False) -> None:
+    """Propagate a committed service mutation to the in-process indexes, caches and feed.
+
+    ``was_open`` is whether the service was PUBLICADO before the mutation.
+    """
+    is_open = service.status == ServiceStatus.PUBLICADO
+    open_services.sync(service)
+    if was_open or is_open:
+        # suggestions only ever contain open services
+        invalidate_backhaul_area(service.origin_lat, service.origin_lng)
+    list_cache.invalidate()
+    if not (was_open or is_open):
+        # subscribers only follow open services; this one left their feed already
+        return
+    if not is_open:
+        kind = "withdrawn"
+    else:
+        kind = "published" if created else "changed"
+    payload = ServiceSummaryOut.model_validate(service).model_dump(mode="json")
+    payload.update(origin_lat=service.origin_lat, origin_lng=service.origin_lng)
+    service_feed.publish(kind, service.origin_lat, service.origin_lng, payload)
+
+
+def require_shipper(user: Principal):
     if user.role not in [UserRole.SHIPPER, UserRole.BOTH]:
         raise HTTPException(status_code=403, detail="Apenas embarcador")
 
 
-def require_driver(user: User):
+def require_driver(user: Principal):
     if user.role not in [UserRole.DRIVER, UserRole.BOTH]:
         raise HTTPException(status_code=403, detail="Apenas caminhoneiro")
 
 
 @app.post("/services", response_model=ServiceOut)
-def create_service(payload: ServiceIn, user: User = Depends(current_user), db: Session = Depends(get_db)):
+async def create_service(payload: ServiceIn, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
     require_shipper(user)
     service = Service(created_by_user_id=user.id, **payload.model_dump())
+    service.update_trip_metrics()
     db.add(service)
-    db.commit()
-    db.refresh(service)
+    await db.flush()
+    await record_changes(db, [service.id])
+    await db.commit()
+    await db.refresh(service)
+    _service_changed(service, was_open=False, created=True)
     return service
 
 
+_SUMMARY_ROW_FIELDS = [name for name in ServiceSummaryOut.model_fields if name != "id"]
+
+
+def _services_created(ids: list[int], rows: list[dict]) -> None:
+    """Bulk counterpart of ``_service_changed`` for freshly inserted PUBLICADO services."""
+    list_cache.invalidate()
+    backhaul_cache.clear()
+    for service_id, row in zip(ids, rows):
+        open_services.add(
+            service_id,
+            row["origin_lat"],
+            row["origin_lng"],
+            row["dest_lat"],
+            row["dest_lng"],
+            row["pickup_window_start"],
+            row["pickup_window_end"],
+        )
+        summary = ServiceSummaryOut(id=service_id, **{k: row[k] for k in _SUMMARY_ROW_FIELDS})
+        payload = summary.model_dump(mode="json")
+        payload.update(origin_lat=row["origin_lat"], origin_lng=row["origin_lng"])
+        service_feed.publish("published", row["origin_lat"], row["origin_lng"], payload)
+
+
+async def _insert_service_chunk(
+    db: AsyncSession, user_id: int, chunk: list[tuple[int, ServiceIn]]
+) -> tuple[int, list[tuple[int, str]]]:
+    """Insert ``(line, payload)`` rows with one executemany and commit.
+
+    If the batch fails, it is retried row by row so only the offending lines are
+    reported. Returns the number of rows created and ``(line, message)`` failures.
+    """
+    now = datetime.utcnow()
+    rows = []
+    for _, payload in chunk:
+        row = payload.model_dump()
+        row["trip_km"], row["price_per_km"] = trip_metrics(
+            payload.origin_lat,
+            payload.origin_lng,
+            payload.dest_lat,
+            payload.dest_lng,
+            payload.offered_price,
+        )
+        row.update(created_by_user_id=user_id, status=ServiceStatus.PUBLICADO, created_at=now)
+        rows.append(row)
+    try:
+        result = await db.scalars(
+            insert(Service).returning(Service.id, sort_by_parameter_order=True), rows
+        )
+        ids = list(result.all())
+        await record_changes(db, ids)
+        await db.commit()
+    except SQLAlchemyError:
+        await db.rollback()
+        if len(chunk) == 1:
+            return 0, [(chunk[0][0], "Não foi possível gravar a linha")]
+        created, failures = 0, []
+        for item in chunk:
+            inserted, rejected = await _insert_service_chunk(db, user_id, [item])
+            created += inserted
+            failures += rejected
+        return created, failures
+    _services_created(ids, rows)
+    return len(ids), []
+
+
+_BULK_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "text/csv": {"schema": {"type": "string"}},
+            "application/x-ndjson": {"schema": {"type": "string"}},
+        },
+    }
+}
+
+
+@app.post("/services/bulk", response_model=BulkServicesOut, openapi_extra=_BULK_UPLOAD_BODY)
+async def create_services_bulk(
+    request: Request, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)
+):
+    """Create services from a streamed CSV (header row + ``ServiceIn`` columns) or NDJSON body.
+
+    Rows are validated as they arrive and inserted ``bulk_chunk_size`` at a time,
+    one commit per chunk, so memory stays bounded by the chunk size whatever
+    the upload size. Invalid rows are reported by line and skipped. A body that
+    cannot be read on (bad encoding, overlong line) stops the upload there: the
+    rows before it are still inserted and the report says why it stopped, so a
+    client knows what was stored before it retries.
+    """
+    require_shipper(user)
+    fmt = upload_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Use text/csv ou application/x-ndjson")
+    received = created = failed = 0
+    errors: list[BulkRowError] = []
+    chunk: list[tuple[int, ServiceIn]] = []
+    error = None
+
+    def reject(line: int, row_errors: list[dict]) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < settings.bulk_max_errors:
+            errors.append(BulkRowError(line=line, errors=row_errors))
+
+    async def flush() -> None:
+        nonlocal created
+        inserted, rejected = await _insert_service_chunk(db, user.id, chunk)
+        created += inserted
+        for line, detail in rejected:
+            reject(line, [{"loc": [], "msg": detail}])
+        chunk.clear()
+
+    try:
+        async for line, row in validated_rows(request.stream(), fmt, ServiceIn):
+            received += 1
+            if isinstance(row, RowError):
+                reject(line, row.errors)
+                continue
+            chunk.append((line, row))
+            if len(chunk) >= settings.bulk_chunk_size:
+                await flush()
+    except (ValueError, UnicodeDecodeError) as exc:
+        error = f"Upload inválido: {exc}"
+    if chunk:
+        await flush()
+    return BulkServicesOut(
+        received=received,
+        created=created,
+        failed=failed,
+        errors=errors,
+        errors_truncated=failed > len(errors),
+        error=error,
+    )
+
+
+def _decode_cursor(cursor: str, kind: str) -> list:
+    try:
+        return decode_cursor(cursor, kind)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido") from None
+
+
+async def _keyset_page(
+    db: AsyncSession,
+    query: Select,
+    limit: int,
+    cursor: str | None,
+    response: Response,
+    scalars: bool = True,
+) -> list:
+    """Newest-first page of ``query`` keyed on ``(created_at, id)``.
+
+    The cursor for the following page, if any, goes in the ``X-Next-Cursor`` header.
+    """
+    if cursor:
+        created_at, service_id = _decode_cursor(cursor, "t")
+        try:
+            after = (datetime.fromisoformat(created_at), int(service_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Cursor inválido") from None
+        query = query.where(tuple_(Service.created_at, Service.id) < after)
+    query = query.order_by(Service.created_at.desc(), Service.id.desc()).limit(limit + 1)
+    result = await db.execute(query)
+    rows = list(result.scalars().all() if scalars else result.all())
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor("t", rows[-1].created_at, rows[-1].id)
+    return rows
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def _model_json(model: type) -> Callable[[list], bytes]:
+    adapter = TypeAdapter(list[model])
+    return lambda items: adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+
+def _list_json(
+    model_json: Callable[[list], bytes], encoder: RowEncoder
+) -> Callable[[list], bytes]:
+    """Serializer for a list endpoint: row tuples through ``encoder`` on the fast path."""
+    return encoder.encode if settings.fast_list_serialization else model_json
+
+
+def _json_response(body: bytes, response: Response) -> Response:
+    headers = {k: v for k, v in response.headers.items() if k == "x-next-cursor"}
+    return Response(body, media_type="application/json", headers=headers)
+
+
+SERVICE_ROWS = RowEncoder(ServiceOut)
+SUMMARY_ROWS = RowEncoder(ServiceSummaryOut)
+OFFER_ROWS = RowEncoder(OfferOut)
+SERVICE_JSON = _model_json(ServiceOut)
+SUMMARY_JSON = _model_json(ServiceSummaryOut)
+
+
+async def _cached_list(request: Request, serialize: Callable[[list], bytes], build) -> Response:
+    """Serve a public list from ``list_cache``, or build, serialize and cache it.
+
+    ``build(response)`` returns the page items and may set headers such as
+    ``X-Next-Cursor`` on the scratch ``response``; they are cached with the body.
+    """
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    cached = list_cache.get(key)
+    if cached is None:
+        generation = list_cache.generation
+        scratch = Response()
+        items = await build(scratch)
+        body = serialize(items)
+        headers = {k: v for k, v in scratch.headers.items() if k == "x-next-cursor"}
+        cached = CachedResponse(body, strong_etag(body), headers)
+        list_cache.set(key, cached, generation)
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return _not_modified(cached.etag)
+    return Response(
+        cached.body,
+        media_type="application/json",
+        headers={**cached.headers, "ETag": cached.etag, "Cache-Control": "no-cache"},
+    )
+
+
 @app.get("/services", response_model=list[ServiceOut])
-def list_services(
-    near_lat: float | None = None,
-    near_lng: float | None = None,
+async def list_services(
+    request: Request,
+    near_lat: float | None = Query(None, ge=-90, le=90),
+    near_lng: float | None = Query(None, ge=-180, le=180),
     radius_km: float = 100,
     status: ServiceStatus = ServiceStatus.PUBLICADO,
-    db: Session = Depends(get_db),
+    limit: int = PAGE_LIMIT,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    fast = settings.fast_list_serialization
+
+    async def build(response: Response) -> list:
+        if near_lat is None or near_lng is None:
+            if fast:
+                query = select(*SERVICE_ROWS.columns(Service), Service.created_at)
+                query = query.where(Service.status == status)
+                return await _keyset_page(db, query, limit, cursor, response, scalars=False)
+            query = select(Service).where(Service.status == status)
+            return await _keyset_page(db, query, limit, cursor, response)
+        after = None
+        if cursor:
+            distance, service_id = _decode_cursor(cursor, "d")
+            try:
+                after = (float(distance), int(service_id))
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Cursor inválido") from None
+        ranked = await services_near(
+            db, status, near_lat, near_lng, radius_km, after=after, limit=limit + 1
+        )
+        if len(ranked) > limit:
+            ranked = ranked[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(
+                "d", ranked[-1][1], ranked[-1][0].id
+            )
+        services = [s for s, _ in ranked]
+        return SERVICE_ROWS.rows_from(services) if fast else services
+
+    return await _cached_list(request, _list_json(SERVICE_JSON, SERVICE_ROWS), build)
+
+
+@app.get("/services/stream")
+async def stream_services(
+    near_lat: float = Query(ge=-90, le=90),
+    near_lng: float = Query(ge=-180, le=180),
+    radius_km: float = Query(100, gt=0, le=1000),
+):
+    """Server-sent events for services published, changed or withdrawn in the area.
+
+    Events are ``published``, ``changed`` and ``withdrawn`` with the service
+    summary as data; ``resync`` means the client fell behind and should refetch
+    the list. Comment lines are sent as keepalives while the area is quiet.
+    """
+    async def frames():
+        subscriber = service_feed.subscribe(near_lat, near_lng, radius_km)
+        try:
+            yield ": subscribed\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(
+                        subscriber.queue.get(), settings.live_feed_keepalive_seconds
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            service_feed.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/services/changes", response_model=ServiceChangesOut)
+async def service_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+):
+    """Services changed after change sequence ``since``, for delta sync of a local list.
+
+    Each changed service appears once with its current state and the ``seq`` of
+    its latest change, whatever its status, so clients drop the ones no longer
+    PUBLICADO. Poll again with ``since=next``; ``more`` means call right away.
+    ``pending`` means a write still in flight holds the cursor back: retry after
+    the ``Retry-After`` seconds rather than immediately.
+    """
+    upto, more, pending = await visible_upto(db, since, limit, settings.change_feed_settle_ms)
+    rows = await changed_services(db, since, upto) if upto > since else []
+    body = b'{"next":%d,"more":%s,"pending":%s,"changes":%s}' % (
+        upto,
+        b"true" if more else b"false",
+        b"true" if pending else b"false",
+        CHANGE_ROWS.encode(rows),
+    )
+    headers = {"Retry-After": str(-(-settings.change_feed_settle_ms // 1000))} if pending else None
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/services/summary", response_model=list[ServiceSummaryOut])
+async def list_service_summaries(
+    request: Request,
+    status: ServiceStatus = ServiceStatus.PUBLICADO,
+    limit: int = PAGE_LIMIT,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
 ):
-    services = list(db.scalars(select(Service).where(Service.status == status)).all())
-    if near_lat is not None and near_lng is not None:
-        services = [
-            s
-            for s in services
-            if haversine_km(near_lat, near_lng, s.origin_lat, s.origin_lng) <= radius_km
-        ]
-    return services
+    async def build(response: Response) -> list:
+        query = select(*SUMMARY_ROWS.columns(Service)).where(Service.status == status)
+        return await _keyset_page(db, query, limit, cursor, response, scalars=False)
+
+    return await _cached_list(request, _list_json(SUMMARY_JSON, SUMMARY_ROWS), build)
 
 
 @app.get("/services/{service_id}", response_model=ServiceOut)
-def get_service(service_id: int, db: Session = Depends(get_db)):
-    service = db.get(Service, service_id)
+async def get_service(
+    service_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    """Single service with a version ETag.
+
+    A matching ``If-None-Match`` is answered with 304 after reading only the
+    version column, so polling a shipment's status costs one index lookup.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        version = await db.scalar(select(Service.version).where(Service.id == service_id))
+        if version is not None and etag_matches(if_none_match, service_etag(service_id, version)):
+            return _not_modified(service_etag(service_id, version))
+    service = await db.get(Service, service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Serviço não encontrado")
+    response.headers["ETag"] = service_etag(service.id, service.version)
+    response.headers["Cache-Control"] = "no-cache"
     return service
 
 
 @app.patch("/services/{service_id}", response_model=ServiceOut)
-def patch_service(
+async def patch_service(
     service_id: int,
     payload: ServicePatch,
-    user: User = Depends(current_user),
-    db: Session = Depends(get_db),
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db),
 ):
-    service = db.get(Service, service_id)
+    service = await db.get(Service, service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Serviço não encontrado")
     if service.created_by_user_id != user.id:
         raise HTTPException(status_code=403, detail="Sem permissão")
     if service.status not in [ServiceStatus.PUBLICADO, ServiceStatus.EM_NEGOCIACAO]:
         raise HTTPException(status_code=400, detail="Status não permite edição")
+    was_open = service.status == ServiceStatus.PUBLICADO
     for k, v in payload.model_dump(exclude_none=True).items():
         setattr(service, k, v)
-    db.commit()
-    db.refresh(service)
+    service.update_trip_metrics()
+    service.bump_version()
+    await record_changes(db, [service.id])
+    await db.commit()
+    await db.refresh(service)
+    _service_changed(service, was_open)
     return service
 
 
 @app.post("/services/{service_id}/offers", response_model=OfferOut)
-def create_offer(service_id: int, payload: OfferIn, user: User = Depends(current_user), db: Session = Depends(get_db)):
+async def create_offer(service_id: int, payload: OfferIn, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
     require_driver(user)
-    service = db.get(Service, service_id)
+    service = await db.get(Service, service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Serviço não encontrado")
     if service.status in [ServiceStatus.ACEITO, ServiceStatus.CANCELADO, ServiceStatus.ENTREGUE]:
         raise HTTPException(status_code=400, detail="Serviço indisponível para oferta")
     offer = Offer(service_id=service_id, driver_user_id=user.id, **payload.model_dump())
     db.add(offer)
-    if service.status == ServiceStatus.PUBLICADO:
+    was_open = service.status == ServiceStatus.PUBLICADO
+    if was_open:
         service.status = ServiceStatus.EM_NEGOCIACAO
-    db.commit()
-    db.refresh(offer)
+    service.bump_version()
+    await record_changes(db, [service_id])
+    await db.commit()
+    await db.refresh(offer)
+    _service_changed(service, was_open)
     if payload.kind == OfferKind.ACCEPT:
-        _accept_offer(service, offer, db)
-        db.refresh(offer)
+        await _accept_offer(service, offer, db)
+        await db.refresh(offer)
     return offer
 
 
-def _accept_offer(service: Service, offer: Offer, db: Session):
-    existing = db.scalar(select(Assignment).where(Assignment.service_id == service.id))
-    if existing:
-        raise HTTPException(status_code=400, detail="Serviço já atribuído")
-    for o in service.offers:
-        o.status = OfferStatus.REJECTED if o.id != offer.id else OfferStatus.ACCEPTED
-    assignment = Assignment(service_id=service.id, driver_user_id=offer.driver_user_id, accepted_offer_id=offer.id)
-    service.status = ServiceStatus.ACEITO
-    db.add(assignment)
-    db.commit()
+ACCEPTABLE_STATUSES = (ServiceStatus.PUBLICADO, ServiceStatus.EM_NEGOCIACAO)
+
+
+async def _accept_offer(service: Service, offer: Offer, db: AsyncSession):
+    """Accept ``offer`` and reject every other offer on ``service`` in one transaction.
+
+    The conditional status UPDATE runs first and holds the service row lock
+    until commit, so of several concurrent accepts exactly one moves the service
+    to ACEITO; the others see zero rows updated and get the deterministic answer
+    from :func:`_accept_outcome`.
+    """
+    service_id, offer_id = service.id, offer.id
+    was_open = service.status == ServiceStatus.PUBLICADO
+    claimed = await db.execute(
+        update(Service)
+        .where(Service.id == service_id, Service.status.in_(ACCEPTABLE_STATUSES))
+        .values(status=ServiceStatus.ACEITO, version=Service.version + 1)
+    )
+    if claimed.rowcount != 1:
+        await db.rollback()
+        return await _accept_outcome(service_id, offer_id, db)
+    await db.execute(
+        update(Offer)
+        .where(Offer.service_id == service_id)
+        .values(
+            status=case((Offer.id == offer_id, OfferStatus.ACCEPTED), else_=OfferStatus.REJECTED)
+        )
+    )
+    db.add(
+        Assignment(
+            service_id=service_id, driver_user_id=offer.driver_user_id, accepted_offer_id=offer_id
+        )
+    )
+    await record_changes(db, [service_id])
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return await _accept_outcome(service_id, offer_id, db)
+    _service_changed(service, was_open)
+
+
+async def _accept_outcome(service_id: int, offer_id: int, db: AsyncSession):
+    """Repeating the winning accept is a no-op; anything else is a 409 conflict."""
+    assignment = await db.scalar(select(Assignment).where(Assignment.service_id == service_id))
+    if assignment is None:
+        raise HTTPException(status_code=409, detail="Serviço indisponível para aceite")
+    if assignment.accepted_offer_id != offer_id:
+        raise HTTPException(status_code=409, detail="Serviço já atribuído")
 
 
 @app.get("/services/{service_id}/offers", response_model=list[OfferOut])
-def list_offers(service_id: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
-    service = db.get(Service, service_id)
+async def list_offers(service_id: int, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
+    service = await db.get(Service, service_id)
     if not service:
         raise HTTPException(status_code=404, detail="Serviço não encontrado")
-    offers = list(db.scalars(select(Offer).where(Offer.service_id == service_id)).all())
+    fast = settings.fast_list_serialization
+    query = select(*OFFER_ROWS.columns(Offer)) if fast else select(Offer)
+    result = await db.execute(query.where(Offer.service_id == service_id))
+    offers = list(result.all() if fast else result.scalars().all())
     participants = {o.driver_user_id for o in offers}
     if user.id != service.created_by_user_id and user.id not in participants:
         raise HTTPException(status_code=403, detail="Sem permissão")
+    if fast:
+        return Response(OFFER_ROWS.encode(offers), media_type="application/json")
     return offers
 
 
 @app.post("/offers/{offer_id}/accept", response_model=OfferOut)
-def accept_counter_offer(offer_id: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
-    offer = db.get(Offer, offer_id)
+async def accept_counter_offer(offer_id: int, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
+    offer = await db.get(Offer, offer_id)
     if not offer:
         raise HTTPException(status_code=404, detail="Oferta não encontrada")
-    service = db.get(Service, offer.service_id)
+    service = await db.get(Service, offer.service_id)
     if service.created_by_user_id != user.id:
         raise HTTPException(status_code=403, detail="Sem permissão")
     if offer.kind != OfferKind.COUNTER:
         raise HTTPException(status_code=400, detail="Somente contraproposta pode ser aceita aqui")
-    _accept_offer(service, offer, db)
-    db.refresh(offer)
+    await _accept_offer(service, offer, db)
+    await db.refresh(offer)
     return offer
 
 
-def _driver_assignment(service_id: int, user_id: int, db: Session) -> tuple[Assignment, Service]:
-    assignment = db.scalar(
+async def _driver_assignment(service_id: int, user_id: int, db: AsyncSession) -> tuple[Assignment, Service]:
+    assignment = await db.scalar(
         select(Assignment).where(and_(Assignment.service_id == service_id, Assignment.driver_user_id == user_id))
     )
     if not assignment:
         raise HTTPException(status_code=403, detail="Somente motorista do assignment")
-    service = db.get(Service, service_id)
+    service = await db.get(Service, service_id)
     return assignment, service
 
 
 @app.post("/assignments/{service_id}/collect")
-def collect(service_id: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
+async def collect(service_id: int, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
     require_driver(user)
-    _, service = _driver_assignment(service_id, user.id, db)
+    _, service = await _driver_assignment(service_id, user.id, db)
     if service.status != ServiceStatus.ACEITO:
         raise HTTPException(status_code=400, detail="Status inválido")
     service.status = ServiceStatus.COLETADO
-    db.commit()
+    service.bump_version()
+    await record_changes(db, [service_id])
+    await db.commit()
+    _service_changed(service, was_open=False)
     return {"ok": True, "status": service.status}
 
 
 @app.post("/assignments/{service_id}/deliver")
-def deliver(service_id: int, user: User = Depends(current_user), db: Session = Depends(get_db)):
+async def deliver(service_id: int, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
     require_driver(user)
-    _, service = _driver_assignment(service_id, user.id, db)
+    _, service = await _driver_assignment(service_id, user.id, db)
     if service.status != ServiceStatus.COLETADO:
         raise HTTPException(status_code=400, detail="Status inválido")
     service.status = ServiceStatus.ENTREGUE
-    db.commit()
+    service.bump_version()
+    await record_changes(db, [service_id])
+    await db.commit()
+    _service_changed(service, was_open=False)
     return {"ok": True, "status": service.status}
 
 
 @app.post("/drivers/intent")
-def set_intent(payload: DriverIntentIn, user: User = Depends(current_user), db: Session = Depends(get_db)):
+async def set_intent(payload: DriverIntentIn, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)):
     require_driver(user)
-    intent = db.get(DriverIntent, user.id)
+    intent = await db.get(DriverIntent, user.id)
     if not intent:
         intent = DriverIntent(driver_user_id=user.id, **payload.model_dump())
         db.add(intent)
     else:
         for k, v in payload.model_dump().items():
             setattr(intent, k, v)
-    db.commit()
+    await db.commit()
+    backhaul_cache.invalidate_where(lambda key: key.driver_id == user.id)
     return {"ok": True}
 
 
 @app.get("/drivers/{driver_id}/backhaul_suggestions", response_model=list[BackhaulOut])
-def backhaul(
+async def backhaul(
     driver_id: int,
-    from_lat: float,
-    from_lng: float,
-    intended_dest_lat: float,
-    intended_dest_lng: float,
+    from_lat: float = Query(ge=-90, le=90),
+    from_lng: float = Query(ge=-180, le=180),
+    intended_dest_lat: float = Query(ge=-90, le=90),
+    intended_dest_lng: float = Query(ge=-180, le=180),
     radius_km: float = Query(200, le=1000),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    candidates = list(db.scalars(select(Service).where(Service.status == ServiceStatus.PUBLICADO)).all())
+    key = backhaul_key(
+        driver_id, from_lat, from_lng, intended_dest_lat, intended_dest_lng, radius_km
+    )
+    cached = backhaul_cache.get(key)
+    if cached is not None:
+        return cached
+    intent = await db.get(DriverIntent, driver_id)
+    nearby = await backhaul_candidates(
+        db,
+        from_lat,
+        from_lng,
+        intended_dest_lat,
+        intended_dest_lng,
+        radius_km,
+        driver_availability(datetime.utcnow(), intent),
+    )
+    metrics = [
+        (s.trip_km, s.price_per_km)
+        if s.trip_km is not None
+        else trip_metrics(s.origin_lat, s.origin_lng, s.dest_lat, s.dest_lng, s.offered_price)
+        for s, _ in nearby
+    ]
+    pickup_km = [d for _, d in nearby]
+    trip_km = [m[0] for m in metrics]
+    price_per_km = [m[1] for m in metrics]
+    dest_lats = [s.dest_lat for s, _ in nearby]
+    dest_lngs = [s.dest_lng for s, _ in nearby]
+    if road_matrix is not None and nearby:
+        pickup_km, trip_km, price_per_km = road_legs(
+            road_matrix,
+            from_lat,
+            from_lng,
+            [s.origin_lat for s, _ in nearby],
+            [s.origin_lng for s, _ in nearby],
+            dest_lats,
+            dest_lngs,
+            [float(s.offered_price) for s, _ in nearby],
+        )
+    scores, detours = backhaul_scores(
+        from_lat,
+        from_lng,
+        intended_dest_lat,
+        intended_dest_lng,
+        pickup_km=pickup_km,
+        trip_km=trip_km,
+        price_per_km=price_per_km,
+        dest_lats=dest_lats,
+        dest_lngs=dest_lngs,
+        roads=road_matrix,
+    )
     results = []
-    for s in candidates:
-        pickup_distance = haversine_km(from_lat, from_lng, s.origin_lat, s.origin_lng)
-        if pickup_distance > radius_km:
-            continue
-        trip = haversine_km(s.origin_lat, s.origin_lng, s.dest_lat, s.dest_lng)
-        detour = pickup_distance + trip - haversine_km(from_lat, from_lng, s.dest_lat, s.dest_lng)
-        price_per_km = float(s.offered_price) / max(trip, 1)
-        score = -(pickup_distance * 1.2) - (detour * 2.0) + (price_per_km * 1.0)
-        dest_gap = haversine_km(s.dest_lat, s.dest_lng, intended_dest_lat, intended_dest_lng)
-        score -= dest_gap * 0.5
+    for i in top_k(scores, BACKHAUL_TOP_K):
+        s = nearby[i][0]
         results.append(
             BackhaulOut(
                 service_id=s.id,
                 title=s.title,
                 offered_price=float(s.offered_price),
-                pickup_distance_km=round(pickup_distance, 2),
-                detour_distance_km=round(detour, 2),
-                origin_to_dest_km=round(trip, 2),
-                score=round(score, 2),
+                pickup_distance_km=round(float(pickup_km[i]), 2),
+                detour_distance_km=round(float(detours[i]), 2),
+                origin_to_dest_km=round(float(trip_km[i]), 2),
+                score=round(float(scores[i]), 2),
             )
         )
-    return sorted(results, key=lambda x: x.score, reverse=True)[:10]
+    backhaul_cache.set(key, results)
+    return results
+
+
+@app.get("/drivers/{driver_id}/backhaul_suggestions/precomputed", response_model=list[BackhaulOut])
+async def precomputed_backhaul(
+    driver_id: int, user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)
+):
+    if user.id != driver_id:
+        raise HTTPException(status_code=403, detail="Sem permissão")
+    result = await db.execute(
+        select(BackhaulSuggestion, Service.title, Service.offered_price)
+        .join(Service, Service.id == BackhaulSuggestion.service_id)
+        .where(
+            BackhaulSuggestion.driver_user_id == driver_id,
+            Service.status == ServiceStatus.PUBLICADO,
+        )
+        .order_by(BackhaulSuggestion.rank)
+    )
+    rows = result.all()
+    return [
+        BackhaulOut(
+            service_id=s.service_id,
+            title=title,
+            offered_price=float(price),
+            pickup_distance_km=s.pickup_distance_km,
+            detour_distance_km=s.detour_distance_km,
+            origin_to_dest_km=s.origin_to_dest_km,
+            score=s.score,
+        )
+        for s, title, price in rows
+    ]
 
 
 @app.get("/shipper/my-services", response_model=list[ServiceOut])
-def my_services(user: User = Depends(current_user), db: Session = Depends(get_db)):
+async def my_services(
+    response: Response,
+    limit: int = PAGE_LIMIT,
+    cursor: str | None = None,
+    user: Principal = Depends(current_user),
+    db: AsyncSession = Depends(get_db),
+):
     require_shipper(user)
-    return list(db.scalars(select(Service).where(Service.created_by_user_id == user.id)).all())
+    if settings.fast_list_serialization:
+        query = select(*SERVICE_ROWS.columns(Service), Service.created_at)
+        query = query.where(Service.created_by_user_id == user.id)
+        rows = await _keyset_page(db, query, limit, cursor, response, scalars=False)
+        return _json_response(SERVICE_ROWS.encode(rows), response)
+    query = select(Service).where(Service.created_by_user_id == user.id)
+    return await _keyset_page(db, query, limit, cursor, response)
 
 
 @app.get("/driver/my-assignment", response_model=ServiceOut | None)
-def my_assignment(user: User = Depends(current_user), db: Session = Depends(get_db)):
+async def my_assignment(
+    user: Principal = Depends(current_user), db: AsyncSession = Depends(get_db)
+):
     require_driver(user)
-    assignment = db.scalar(select(Assignment).where(Assignment.driver_user_id == user.id).order_by(Assignment.id.desc()))
-    if not assignment:
-        return None
-    return db.get(Service, assignment.service_id)
+    return await db.scalar(
+        select(Service)
+        .join(Assignment, Assignment.service_id == Service.id)
+        .where(Assignment.driver_user_id == user.id)
+        .order_by(Assignment.id.desc())
+        .limit(1)
+    )
+
+
+@app.get("/internal/cache/stats", dependencies=[Depends(require_internal)])
+async def cache_stats():
+    return {
+        "backhaul": backhaul_cache.stats(),
+        "auth_tokens": token_cache.stats(),
+        "auth_user_versions": user_versions.stats(),
+        "live_feed": service_feed.stats(),
+        "service_lists": list_cache.stats(),
+    }
+
+
+@app.get("/internal/db/pool", dependencies=[Depends(require_internal)])
+async def db_pool_stats():
+    return pool_stats(async_engine.sync_engine)
+
+
+@app.get(
+    "/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_internal)]
+)
+async def metrics():
+    return PlainTextResponse(
+        request_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -6,6 +6,7 @@ from sqlalchemy import (
     Enum as SAEnum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
@@ -14,6 +15,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.db import Base
+from app.services.geo import haversine_km
 
 
 class UserRole(str, Enum):
@@ -42,6 +44,13 @@ class OfferStatus(str, Enum):
     REJECTED = "REJECTED"
 
 
+def trip_metrics(
+    origin_lat: float, origin_lng: float, dest_lat: float, dest_lng: float, offered_price: float
+) -> tuple[float, float]:
+    trip = haversine_km(origin_lat, origin_lng, dest_lat, dest_lng)
+    return trip, float(offered_price) / max(trip, 1)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -51,6 +60,7 @@ class User(Base):
     password_hash: Mapped[str] = mapped_column(String(255))
     role: Mapped[UserRole] = mapped_column(SAEnum(UserRole), default=UserRole.SHIPPER)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
 
 class DriverProfile(Base):
@@ -92,9 +102,27 @@ class Service(Base):
     offered_price: Mapped[float] = mapped_column(Numeric(12, 2))
     status: Mapped[ServiceStatus] = mapped_column(SAEnum(ServiceStatus), default=ServiceStatus.PUBLICADO)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    trip_km: Mapped[float | None] = mapped_column(Float, nullable=True)
+    price_per_km: Mapped[float | None] = mapped_column(Float, nullable=True)
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
 
     offers = relationship("Offer", back_populates="service")
 
+    __table_args__ = (
+        Index("ix_services_status_origin", "status", "origin_lat", "origin_lng"),
+        Index("ix_services_status_created", "status", "created_at", "id"),
+        Index("ix_services_owner_created", "created_by_user_id", "created_at", "id"),
+    )
+
+    def update_trip_metrics(self) -> None:
+        self.trip_km, self.price_per_km = trip_metrics(
+            self.origin_lat, self.origin_lng, self.dest_lat, self.dest_lng, self.offered_price
+        )
+
+    def bump_version(self) -> None:
+        """Bump the ETag version in SQL so concurrent writers never reuse a number."""
+        self.version = Service.version + 1
+
 
 class Offer(Base):
     __tablename__ = "offers"
@@ -120,6 +148,8 @@ class Assignment(Base):
     accepted_offer_id: Mapped[int] = mapped_column(ForeignKey("offers.id"))
     accepted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_assignments_driver_id", "driver_user_id", "id"),)
+
 
 class DriverIntent(Base):
     __tablename__ = "driver_intents"
@@ -132,3 +162,27 @@ class DriverIntent(Base):
     intended_dest_address: Mapped[str] = mapped_column(String(255))
     available_from: Mapped[datetime] = mapped_column(DateTime)
     available_to: Mapped[datetime] = mapped_column(DateTime)
+
+
+class BackhaulSuggestion(Base):
+    __tablename__ = "backhaul_suggestions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    driver_user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    service_id: Mapped[int] = mapped_column(ForeignKey("services.id"))
+    rank: Mapped[int] = mapped_column(Integer)
+    score: Mapped[float] = mapped_column(Float)
+    pickup_distance_km: Mapped[float] = mapped_column(Float)
+    detour_distance_km: Mapped[float] = mapped_column(Float)
+    origin_to_dest_km: Mapped[float] = mapped_column(Float)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ServiceChange(Base):
+    """Append-only log of service mutations; ``seq`` is the change-feed cursor."""
+
+    __tablename__ = "service_changes"
+
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)
+    service_id: Mapped[int] = mapped_column(ForeignKey("services.id"))
+    changed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
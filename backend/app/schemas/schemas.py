@@ -64,6 +64,58 @@ class ServiceOut(ServiceIn):
         from_attributes = True
 
 
+class BulkRowError(BaseModel):
+    line: int
+    errors: list[dict]
+
+
+class BulkServicesOut(BaseModel):
+    received: int
+    created: int
+    failed: int
+    errors: list[BulkRowError]
+    errors_truncated: bool
+    # why reading stopped early, if it did; rows before that point are kept
+    error: str | None = None
+
+
+class ServiceSummaryOut(BaseModel):
+    id: int
+    title: str
+    service_type: str
+    origin_address: str
+    dest_address: str
+    pickup_window_start: datetime
+    offered_price: float
+    status: ServiceStatus
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ServiceChangeOut(BaseModel):
+    seq: int
+    id: int
+    status: ServiceStatus
+    version: int
+    title: str
+    service_type: str
+    origin_lat: float
+    origin_lng: float
+    dest_lat: float
+    dest_lng: float
+    pickup_window_start: datetime
+    offered_price: float
+
+
+class ServiceChangesOut(BaseModel):
+    next: int
+    more: bool
+    pending: bool
+    changes: list[ServiceChangeOut]
+
+
 class OfferIn(BaseModel):
     kind: OfferKind
     price: float
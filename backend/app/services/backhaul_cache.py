@@ -0,0 +1,56 @@
+from typing import NamedTuple
+
+from app.core.config import settings
+from app.services.cache import TTLCache
+from app.services.geo import KM_PER_DEG_LAT, haversine_km
+
+
+class BackhaulKey(NamedTuple):
+    driver_id: int
+    from_lat: float
+    from_lng: float
+    intended_dest_lat: float
+    intended_dest_lng: float
+    radius_km: float
+
+
+def _quantize(value: float, step: float) -> float:
+    return round(round(value / step) * step, 6)
+
+
+def backhaul_key(
+    driver_id: int,
+    from_lat: float,
+    from_lng: float,
+    intended_dest_lat: float,
+    intended_dest_lng: float,
+    radius_km: float,
+) -> BackhaulKey:
+    """Cache key with coordinates snapped to ``backhaul_cache_grid_deg`` and radius to 1 km.
+
+    Refreshes from roughly the same spot share one entry; the result is the one
+    computed for the first request that landed in the bucket.
+    """
+    step = settings.backhaul_cache_grid_deg
+    return BackhaulKey(
+        driver_id,
+        _quantize(from_lat, step),
+        _quantize(from_lng, step),
+        _quantize(intended_dest_lat, step),
+        _quantize(intended_dest_lng, step),
+        float(round(radius_km)),
+    )
+
+
+backhaul_cache = TTLCache(
+    max_entries=settings.backhaul_cache_max_entries,
+    ttl_seconds=settings.backhaul_cache_ttl_seconds,
+)
+
+
+def invalidate_backhaul_area(lat: float, lng: float) -> int:
+    """Drop cached suggestions whose pickup radius covers a service origin at ``lat``/``lng``."""
+    slack_km = settings.backhaul_cache_grid_deg * KM_PER_DEG_LAT + 1
+    return backhaul_cache.invalidate_where(
+        lambda key: haversine_km(key.from_lat, key.from_lng, lat, lng) <= key.radius_km + slack_km
+    )
@@ -0,0 +1,257 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import (
+    BackhaulSuggestion,
+    DriverIntent,
+    Service,
+    ServiceStatus,
+    trip_metrics,
+)
+from app.services.geo import bounding_box, haversine_km_many
+from app.services.matching import BACKHAUL_TOP_K, backhaul_scores, top_k
+from app.services.road_matrix import open_road_matrix, road_legs
+from app.services.time_windows import Availability, driver_availability, epoch
+
+# driver id, current lat/lng, intended destination lat/lng, availability
+Intent = tuple[int, float, float, float, float, Availability]
+
+
+@dataclass
+class ServiceArrays:
+    """Column-oriented snapshot of open services, cheap to slice and to pickle."""
+
+    ids: np.ndarray
+    origin_lat: np.ndarray
+    origin_lng: np.ndarray
+    dest_lat: np.ndarray
+    dest_lng: np.ndarray
+    offered_price: np.ndarray
+    trip_km: np.ndarray
+    price_per_km: np.ndarray
+    pickup_opens: np.ndarray
+    pickup_closes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def take(self, mask: np.ndarray) -> "ServiceArrays":
+        return ServiceArrays(*(getattr(self, f)[mask] for f in self.__dataclass_fields__))
+
+
+@dataclass
+class BatchResult:
+    drivers: int
+    services: int
+    shards: int
+    suggestions: int
+
+
+def load_open_services(db: Session) -> ServiceArrays:
+    rows = db.execute(
+        select(
+            Service.id,
+            Service.origin_lat,
+            Service.origin_lng,
+            Service.dest_lat,
+            Service.dest_lng,
+            Service.offered_price,
+            Service.trip_km,
+            Service.price_per_km,
+            Service.pickup_window_start,
+            Service.pickup_window_end,
+        ).where(Service.status == ServiceStatus.PUBLICADO)
+    ).all()
+    metrics = [
+        (r.trip_km, r.price_per_km)
+        if r.trip_km is not None
+        else trip_metrics(r.origin_lat, r.origin_lng, r.dest_lat, r.dest_lng, r.offered_price)
+        for r in rows
+    ]
+    return ServiceArrays(
+        ids=np.array([r.id for r in rows], dtype=np.int64),
+        origin_lat=np.array([r.origin_lat for r in rows], dtype=np.float64),
+        origin_lng=np.array([r.origin_lng for r in rows], dtype=np.float64),
+        dest_lat=np.array([r.dest_lat for r in rows], dtype=np.float64),
+        dest_lng=np.array([r.dest_lng for r in rows], dtype=np.float64),
+        offered_price=np.array([float(r.offered_price) for r in rows], dtype=np.float64),
+        trip_km=np.array([m[0] for m in metrics], dtype=np.float64),
+        price_per_km=np.array([m[1] for m in metrics], dtype=np.float64),
+        pickup_opens=np.array([epoch(r.pickup_window_start) for r in rows], dtype=np.float64),
+        pickup_closes=np.array([epoch(r.pickup_window_end) for r in rows], dtype=np.float64),
+    )
+
+
+def load_active_intents(db: Session, now: datetime) -> list[Intent]:
+    rows = db.execute(
+        select(
+            DriverIntent.driver_user_id,
+            DriverIntent.current_lat,
+            DriverIntent.current_lng,
+            DriverIntent.intended_dest_lat,
+            DriverIntent.intended_dest_lng,
+            DriverIntent.available_from,
+            DriverIntent.available_to,
+        ).where(
+            DriverIntent.current_lat.is_not(None),
+            DriverIntent.current_lng.is_not(None),
+            DriverIntent.available_to >= now,
+        )
+    ).all()
+    return [(*r[:5], driver_availability(now, r)) for r in rows]
+
+
+def shard_intents(intents: list[Intent], shard_deg: float) -> dict[tuple[int, int], list[Intent]]:
+    shards: dict[tuple[int, int], list[Intent]] = {}
+    for intent in intents:
+        key = (math.floor(intent[1] / shard_deg), math.floor(intent[2] / shard_deg))
+        shards.setdefault(key, []).append(intent)
+    return shards
+
+
+def _shard_services(
+    intents: list[Intent], services: ServiceArrays, radius_km: float
+) -> ServiceArrays:
+    """Services whose origin may be within ``radius_km`` of some driver in the shard."""
+    lats = [i[1] for i in intents]
+    lngs = [i[2] for i in intents]
+    boxes = [
+        bounding_box(lat, lng, radius_km)
+        for lat in (min(lats), max(lats))
+        for lng in (min(lngs), max(lngs))
+    ]
+    min_lat, max_lat = min(b[0] for b in boxes), max(b[1] for b in boxes)
+    min_lng, max_lng = min(b[2] for b in boxes), max(b[3] for b in boxes)
+    mask = (
+        (services.origin_lat >= min_lat)
+        & (services.origin_lat <= max_lat)
+        & (services.origin_lng >= min_lng)
+        & (services.origin_lng <= max_lng)
+    )
+    return services.take(mask)
+
+
+def match_shard(
+    intents: list[Intent],
+    services: ServiceArrays,
+    radius_km: float,
+    k: int,
+    road_matrix_path: str | None = None,
+) -> list[dict]:
+    """Ranked top-``k`` suggestion rows for every intent of one shard.
+
+    Services whose pickup window misses the driver's availability are dropped
+    before any distance is computed, and those out of reach in time right after.
+
+    The road matrix is passed by path and mapped in the worker, so a process
+    pool shares the file through the page cache instead of pickling it.
+    """
+    roads = open_road_matrix(road_matrix_path)
+    rows = []
+    for driver_id, lat, lng, dest_lat, dest_lng, availability in intents:
+        window = np.flatnonzero(
+            availability.overlapping(services.pickup_opens, services.pickup_closes)
+        )
+        pickup = haversine_km_many(
+            lat, lng, services.origin_lat[window], services.origin_lng[window]
+        )
+        feasible = (pickup <= radius_km) & availability.reachable(
+            pickup, services.pickup_closes[window]
+        )
+        near = window[feasible]
+        if not near.size:
+            continue
+        pickup_km, trip_km = pickup[feasible], services.trip_km[near]
+        price_per_km = services.price_per_km[near]
+        if roads is not None:
+            pickup_km, trip_km, price_per_km = road_legs(
+                roads,
+                lat,
+                lng,
+                services.origin_lat[near],
+                services.origin_lng[near],
+                services.dest_lat[near],
+                services.dest_lng[near],
+                services.offered_price[near],
+            )
+        scores, detours = backhaul_scores(
+            lat,
+            lng,
+            dest_lat,
+            dest_lng,
+            pickup_km=pickup_km,
+            trip_km=trip_km,
+            price_per_km=price_per_km,
+            dest_lats=services.dest_lat[near],
+            dest_lngs=services.dest_lng[near],
+            roads=roads,
+        )
+        for rank, i in enumerate(top_k(scores, k), start=1):
+            rows.append(
+                {
+                    "driver_user_id": driver_id,
+                    "service_id": int(services.ids[near[i]]),
+                    "rank": rank,
+                    "score": round(float(scores[i]), 2),
+                    "pickup_distance_km": round(float(pickup_km[i]), 2),
+                    "detour_distance_km": round(float(detours[i]), 2),
+                    "origin_to_dest_km": round(float(trip_km[i]), 2),
+                }
+            )
+    return rows
+
+
+def _match_shard_task(args: tuple) -> list[dict]:
+    return match_shard(*args)
+
+
+def run_backhaul_batch(
+    db: Session,
+    radius_km: float = 200,
+    k: int = BACKHAUL_TOP_K,
+    workers: int | None = None,
+    shard_deg: float = 5.0,
+    now: datetime | None = None,
+) -> BatchResult:
+    """Score every active driver intent against every open service and store the top-k.
+
+    Drivers are sharded by the grid cell of their current position and each shard
+    only receives the services inside its radius-expanded bounding box, so shards
+    can be scored independently across a process pool. The previous contents of
+    ``backhaul_suggestions`` are replaced in the same transaction.
+    """
+    now = now or datetime.utcnow()
+    intents = load_active_intents(db, now)
+    services = load_open_services(db)
+    shards = shard_intents(intents, shard_deg)
+    tasks = [
+        (
+            members,
+            _shard_services(members, services, radius_km),
+            radius_km,
+            k,
+            settings.road_matrix_path,
+        )
+        for members in shards.values()
+    ]
+    if workers == 1 or len(tasks) <= 1:
+        batches = list(map(_match_shard_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batches = list(pool.map(_match_shard_task, tasks))
+    rows = [dict(row, computed_at=now) for batch in batches for row in batch]
+
+    db.execute(delete(BackhaulSuggestion))
+    if rows:
+        db.execute(insert(BackhaulSuggestion), rows)
+    db.commit()
+    return BatchResult(
+        drivers=len(intents), services=len(services), shards=len(shards), suggestions=len(rows)
+    )
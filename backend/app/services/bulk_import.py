@@ -0,0 +1,103 @@
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterator
+
+from pydantic import BaseModel, ValidationError
+
+CSV_TYPES = ("text/csv",)
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+MAX_RECORD_CHARS = 1_000_000
+
+
+class RowError(Exception):
+    """A record that could not be parsed or validated; ``errors`` is JSON-ready."""
+
+    def __init__(self, errors: list[dict]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def upload_format(content_type: str | None) -> str | None:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CSV_TYPES:
+        return "csv"
+    if media_type in NDJSON_TYPES:
+        return "ndjson"
+    return None
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into ``\n``-terminated lines, holding at most one partial line."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        if len(pending) > MAX_RECORD_CHARS:
+            raise ValueError("Linha muito longa")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _csv_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | RowError]]:
+    header = None
+    record, start, line_no = "", 0, 0
+    async for line in lines:
+        line_no += 1
+        if not record:
+            start = line_no
+        record += line
+        if record.count('"') % 2:
+            if len(record) > MAX_RECORD_CHARS:
+                raise ValueError("Linha muito longa")
+            continue  # a quoted field continues on the next line
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, RowError([{"loc": [], "msg": f"esperadas {len(header)} colunas"}])
+            continue
+        yield start, dict(zip(header, values))
+    if record.strip():
+        yield start, RowError([{"loc": [], "msg": "aspas não fechadas"}])
+
+
+async def _ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | RowError]]:
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_no, RowError([{"loc": [], "msg": f"JSON inválido: {exc.msg}"}])
+            continue
+        if not isinstance(value, dict):
+            yield line_no, RowError([{"loc": [], "msg": "esperado um objeto JSON"}])
+            continue
+        yield line_no, value
+
+
+async def validated_rows(
+    chunks: AsyncIterator[bytes], fmt: str, model: type[BaseModel]
+) -> AsyncIterator[tuple[int, BaseModel | RowError]]:
+    """``(line, model instance or RowError)`` for every record of a streamed upload."""
+    records = _csv_records if fmt == "csv" else _ndjson_records
+    async for line_no, record in records(_lines(chunks)):
+        if isinstance(record, RowError):
+            yield line_no, record
+            continue
+        try:
+            yield line_no, model.model_validate(record)
+        except ValidationError as exc:
+            errors = exc.errors(include_url=False, include_context=False, include_input=False)
+            yield line_no, RowError([{"loc": list(e["loc"]), "msg": e["msg"]} for e in errors])
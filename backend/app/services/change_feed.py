@@ -0,0 +1,68 @@
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Service, ServiceChange
+from app.schemas.schemas import ServiceChangeOut
+from app.services.fast_json import RowEncoder
+
+CHANGE_ROWS = RowEncoder(ServiceChangeOut)
+
+
+async def record_changes(db: AsyncSession, service_ids: Iterable[int]) -> None:
+    """Append one change per service to the feed, inside the caller's transaction.
+
+    Call it right before the commit: a sequence number is handed out at insert
+    time, so the shorter the gap to the commit the sooner readers can move past it.
+    """
+    now = datetime.utcnow()
+    rows = [{"service_id": service_id, "changed_at": now} for service_id in service_ids]
+    if rows:
+        await db.execute(insert(ServiceChange), rows)
+
+
+async def visible_upto(
+    db: AsyncSession, since: int, limit: int, settle_ms: int
+) -> tuple[int, bool, bool]:
+    """``(upto, more, pending)``: the highest ``seq`` up to which the log is known complete.
+
+    Sequence numbers are allocated before commit, so a reader can see ``n + 1``
+    while ``n`` is still in flight. A hole is only skipped once the change after
+    it is older than ``settle_ms``; by then ``n`` was rolled back, not pending.
+    ``more`` says a full page was read and the next one is ready now; ``pending``
+    says reading stopped at an unsettled hole, which no immediate retry can pass.
+    """
+    rows = (
+        await db.execute(
+            select(ServiceChange.seq, ServiceChange.changed_at)
+            .where(ServiceChange.seq > since)
+            .order_by(ServiceChange.seq)
+            .limit(limit)
+        )
+    ).all()
+    horizon = datetime.utcnow() - timedelta(milliseconds=settle_ms)
+    upto = since
+    for seq, changed_at in rows:
+        if seq != upto + 1 and changed_at > horizon:
+            return upto, False, True
+        upto = seq
+    return upto, len(rows) == limit, False
+
+
+async def changed_services(db: AsyncSession, since: int, upto: int) -> list:
+    """Current state of every service changed in ``(since, upto]``, once each, by last change."""
+    latest = (
+        select(ServiceChange.service_id, func.max(ServiceChange.seq).label("seq"))
+        .where(ServiceChange.seq > since, ServiceChange.seq <= upto)
+        .group_by(ServiceChange.service_id)
+        .subquery()
+    )
+    columns = [getattr(Service, name) for name in CHANGE_ROWS.fields[1:]]
+    result = await db.execute(
+        select(latest.c.seq, *columns)
+        .join(Service, Service.id == latest.c.service_id)
+        .order_by(latest.c.seq)
+    )
+    return list(result.all())
@@ -0,0 +1,86 @@
+import csv
+import json
+from collections.abc import Iterator
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import TextIO
+
+from sqlalchemy import Column, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Assignment, Offer, Service
+
+# table name -> (model, timestamp column used by ``since``)
+EXPORTS = {
+    "services": (Service, Service.created_at),
+    "offers": (Offer, Offer.created_at),
+    "assignments": (Assignment, Assignment.accepted_at),
+}
+
+
+def export_columns(table: str) -> list[Column]:
+    model, _ = EXPORTS[table]
+    return list(model.__table__.columns)
+
+
+def iter_rows(
+    db: Session, table: str, since: datetime | None = None, batch_size: int = 2000
+) -> Iterator[tuple]:
+    """Every row of ``table`` in primary key order, fetched ``batch_size`` at a time.
+
+    ``stream_results`` asks the driver for a server-side cursor (a named cursor
+    on psycopg), so only one batch is held in memory however big the table is.
+    """
+    model, timestamp = EXPORTS[table]
+    query = select(*export_columns(table)).order_by(*model.__table__.primary_key.columns)
+    if since is not None:
+        query = query.where(timestamp >= since)
+    result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.partitions():
+        yield from partition
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def write_ndjson(rows: Iterator[tuple], names: list[str], out: TextIO) -> int:
+    count = 0
+    for row in rows:
+        out.write(json.dumps(dict(zip(names, map(_plain, row))), ensure_ascii=False))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(rows: Iterator[tuple], names: list[str], out: TextIO) -> int:
+    writer = csv.writer(out)
+    writer.writerow(names)
+    count = 0
+    for row in rows:
+        writer.writerow(["" if v is None else _plain(v) for v in row])
+        count += 1
+    return count
+
+
+WRITERS = {"ndjson": write_ndjson, "csv": write_csv}
+
+
+def export_table(
+    db: Session,
+    table: str,
+    out: TextIO,
+    fmt: str = "ndjson",
+    since: datetime | None = None,
+    batch_size: int = 2000,
+) -> int:
+    """Stream ``table`` to ``out`` as NDJSON or CSV; returns the number of rows written."""
+    names = [column.name for column in export_columns(table)]
+    return WRITERS[fmt](iter_rows(db, table, since, batch_size), names, out)
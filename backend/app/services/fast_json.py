@@ -0,0 +1,51 @@
+import types
+import typing
+from collections.abc import Iterable, Sequence
+from decimal import Decimal
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+def _is_float(annotation) -> bool:
+    if annotation is float:
+        return True
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        return float in typing.get_args(annotation)
+    return False
+
+
+class RowEncoder:
+    """JSON encoder for rows already shaped like ``model``, without building models.
+
+    Rows are tuples whose leading values follow ``model``'s field order (extra
+    trailing columns, e.g. a cursor key, are ignored). ``Numeric`` columns come
+    back as ``Decimal`` and are turned into floats, as the ``float`` fields of
+    the model would; everything else is handed to pydantic-core's encoder as is.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        self._float_positions = tuple(
+            i for i, field in enumerate(model.model_fields.values()) if _is_float(field.annotation)
+        )
+
+    def columns(self, entity) -> list:
+        """The mapped columns of ``entity`` to select, in field order."""
+        return [getattr(entity, name) for name in self.fields]
+
+    def rows_from(self, objects: Iterable) -> list[tuple]:
+        return [tuple(getattr(obj, name) for name in self.fields) for obj in objects]
+
+    def encode(self, rows: Sequence[Sequence]) -> bytes:
+        fields, floats = self.fields, self._float_positions
+        records = []
+        for row in rows:
+            record = dict(zip(fields, row))
+            for i in floats:
+                value = row[i]
+                if isinstance(value, Decimal):
+                    record[fields[i]] = float(value)
+            records.append(record)
+        return to_json(records)
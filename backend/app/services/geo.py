@@ -1,8 +1,14 @@
 import math
 
+import numpy as np
+from numpy.typing import ArrayLike
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+
 
 def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    r = 6371.0
+    r = EARTH_RADIUS_KM
     dlat = math.radians(lat2 - lat1)
     dlon = math.radians(lon2 - lon1)
     a = (
@@ -13,3 +19,68 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     )
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return r * c
+
+
+def haversine_km_pairwise(
+    lats1: ArrayLike, lons1: ArrayLike, lats2: ArrayLike, lons2: ArrayLike
+) -> np.ndarray:
+    """Element-wise great-circle distance between two aligned arrays of points."""
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lons2, dtype=np.float64) - np.asarray(lons1, dtype=np.float64))
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_km_many(lat: float, lon: float, lats: ArrayLike, lons: ArrayLike) -> np.ndarray:
+    """Great-circle distance from one point to each point of ``lats``/``lons``."""
+    return haversine_km_pairwise(lat, lon, lats, lons)
+
+
+def equirectangular_km_many(lat: float, lon: float, lats: ArrayLike, lons: ArrayLike) -> np.ndarray:
+    """Flat-earth approximation of :func:`haversine_km_many`.
+
+    Good to well under 1% at the few-hundred-km scale used for radius searches,
+    and several times cheaper since it avoids most of the trig.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    dlon = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+    x = dlon * np.cos(np.radians((lats + lat) / 2))
+    y = np.radians(lats - lat)
+    return EARTH_RADIUS_KM * np.hypot(x, y)
+
+
+def within_radius_mask(
+    lat: float,
+    lon: float,
+    lats: ArrayLike,
+    lons: ArrayLike,
+    radius_km: float,
+    slack: float = 0.05,
+) -> np.ndarray:
+    """Cheap pre-filter: ``True`` for points that may lie within ``radius_km``.
+
+    The equirectangular estimate is compared against ``radius_km * (1 + slack)``
+    so points right at the edge are kept; confirm survivors with
+    :func:`haversine_km_many`.
+    """
+    return equirectangular_km_many(lat, lon, lats, lons) <= radius_km * (1 + slack)
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    """``(min_lat, max_lat, min_lon, max_lon)`` enclosing a circle of ``radius_km``.
+
+    The box is conservative: every point within the radius falls inside it. When
+    the circle reaches a pole or spans the antimeridian the longitude range
+    widens to the whole globe instead of wrapping.
+    """
+    dlat = radius_km / KM_PER_DEG_LAT
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    if cos_lat <= 1e-9:
+        return min_lat, max_lat, -180.0, 180.0
+    dlon = radius_km / (KM_PER_DEG_LAT * cos_lat)
+    if dlon >= 180 or lon - dlon < -180 or lon + dlon > 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lon - dlon, lon + dlon
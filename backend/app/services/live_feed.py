@@ -0,0 +1,106 @@
+import asyncio
+import json
+import math
+
+from app.core.config import settings
+from app.services.geo import KM_PER_DEG_LAT, haversine_km
+
+RESYNC = "event: resync\ndata: {}\n\n"
+
+
+class Subscriber:
+    """One live-feed client: its area and a bounded queue of encoded SSE frames."""
+
+    __slots__ = ("lat", "lng", "radius_km", "queue", "cells", "dropped")
+
+    def __init__(self, lat: float, lng: float, radius_km: float, max_pending: int):
+        self.lat = lat
+        self.lng = lng
+        self.radius_km = radius_km
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_pending)
+        self.cells: list[tuple[int, int]] = []
+        self.dropped = 0
+
+    def offer(self, frame: str) -> None:
+        """Enqueue without waiting; a client that fell behind is told to refetch instead."""
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class ServiceFeed:
+    """In-process fan-out of service changes to subscribers, indexed by grid cell.
+
+    A subscriber is registered in every cell its radius touches, so a publish
+    only visits the subscribers of the service's origin cell. Idle subscribers
+    hold nothing but their (empty) queue. Publishing happens on the event loop
+    and never blocks: frames are encoded once and a full queue is collapsed into
+    a single ``resync`` event.
+    """
+
+    def __init__(self, cell_deg: float = 1.0, max_pending: int = 100):
+        self.cell_deg = cell_deg
+        self.max_pending = max_pending
+        self._cells: dict[tuple[int, int], set[Subscriber]] = {}
+        self.subscribers = 0
+        self.delivered = 0
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def _cells_in_radius(self, lat: float, lng: float, radius_km: float) -> list[tuple[int, int]]:
+        dlat = radius_km / KM_PER_DEG_LAT
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        cos_lat = min(math.cos(math.radians(lat_lo)), math.cos(math.radians(lat_hi)))
+        dlng = 180.0 if cos_lat <= 0 else min(radius_km / (KM_PER_DEG_LAT * cos_lat), 180.0)
+        r0, r1 = self._cell(lat_lo, lng)[0], self._cell(lat_hi, lng)[0]
+        c0, c1 = self._cell(lat, lng - dlng)[1], self._cell(lat, lng + dlng)[1]
+        return [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+    def subscribe(self, lat: float, lng: float, radius_km: float) -> Subscriber:
+        subscriber = Subscriber(lat, lng, radius_km, self.max_pending)
+        subscriber.cells = self._cells_in_radius(lat, lng, radius_km)
+        for cell in subscriber.cells:
+            self._cells.setdefault(cell, set()).add(subscriber)
+        self.subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        for cell in subscriber.cells:
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.discard(subscriber)
+                if not bucket:
+                    del self._cells[cell]
+        subscriber.cells = []
+        self.subscribers -= 1
+
+    def publish(self, kind: str, lat: float, lng: float, payload: dict) -> int:
+        """Send ``payload`` as a ``kind`` event to subscribers covering ``lat``/``lng``."""
+        bucket = self._cells.get(self._cell(lat, lng))
+        if not bucket:
+            return 0
+        frame = f"event: {kind}\ndata: {json.dumps(payload, default=str)}\n\n"
+        delivered = 0
+        for subscriber in list(bucket):
+            if haversine_km(subscriber.lat, subscriber.lng, lat, lng) <= subscriber.radius_km:
+                subscriber.offer(frame)
+                delivered += 1
+        self.delivered += delivered
+        return delivered
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "subscribers": self.subscribers,
+            "cells": len(self._cells),
+            "delivered": self.delivered,
+        }
+
+
+service_feed = ServiceFeed(
+    cell_deg=settings.live_feed_cell_deg, max_pending=settings.live_feed_max_pending
+)
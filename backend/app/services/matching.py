@@ -0,0 +1,47 @@
+import heapq
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from app.services.geo import haversine_km_many
+from app.services.road_matrix import RoadMatrix
+
+BACKHAUL_TOP_K = 10
+
+
+def backhaul_scores(
+    from_lat: float,
+    from_lng: float,
+    intended_dest_lat: float,
+    intended_dest_lng: float,
+    pickup_km: ArrayLike,
+    trip_km: ArrayLike,
+    price_per_km: ArrayLike,
+    dest_lats: ArrayLike,
+    dest_lngs: ArrayLike,
+    roads: RoadMatrix | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """``(score, detour_km)`` for every candidate, in one vectorized pass.
+
+    With ``roads`` the direct and destination-gap distances are road distances;
+    pass road ``pickup_km``/``trip_km`` too (see :func:`road_legs`) so the
+    detour compares like with like.
+    """
+    km_many = roads.km_many if roads is not None else haversine_km_many
+    pickup_km = np.asarray(pickup_km, dtype=np.float64)
+    trip_km = np.asarray(trip_km, dtype=np.float64)
+    detour = pickup_km + trip_km - km_many(from_lat, from_lng, dest_lats, dest_lngs)
+    dest_gap = km_many(intended_dest_lat, intended_dest_lng, dest_lats, dest_lngs)
+    score = (
+        -(pickup_km * 1.2)
+        - (detour * 2.0)
+        + np.asarray(price_per_km, dtype=np.float64) * 1.0
+        - dest_gap * 0.5
+    )
+    return score, detour
+
+
+def top_k(scores: np.ndarray, k: int = BACKHAUL_TOP_K) -> list[int]:
+    """Indices of the ``k`` best scores, best first, via a bounded heap."""
+    return heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
+
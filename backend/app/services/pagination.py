@@ -0,0 +1,20 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(kind: str, *values: object) -> str:
+    """Opaque, URL-safe cursor holding the sort key of the last row returned."""
+    payload = [kind] + [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str) -> list:
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` on a malformed cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(payload, list) or len(payload) != 3 or payload[0] != kind:
+        raise ValueError("invalid cursor")
+    return payload[1:]
@@ -0,0 +1,61 @@
+import hashlib
+from collections.abc import Hashable
+from typing import NamedTuple
+
+from app.core.config import settings
+from app.services.cache import TTLCache
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: dict[str, str]
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def service_etag(service_id: int, version: int) -> str:
+    return f'"s{service_id}.{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """``If-None-Match`` check; per RFC 9110 it uses the weak comparison."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class ListCache:
+    """Serialized list responses, dropped wholesale on every service write.
+
+    Entries are tagged with the generation they were computed in, so a page
+    built while a write committed is never stored after that write's
+    invalidation. Other workers only see the write once ``ttl_seconds`` pass.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.generation = 0
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        return self._cache.get(key)
+
+    def set(self, key: Hashable, value: CachedResponse, generation: int) -> None:
+        if generation == self.generation:
+            self._cache.set(key, value)
+
+    def invalidate(self) -> None:
+        self.generation += 1
+        self._cache.clear()
+
+    def stats(self) -> dict[str, float]:
+        return {**self._cache.stats(), "generation": self.generation}
+
+
+list_cache = ListCache(
+    max_entries=settings.list_cache_max_entries, ttl_seconds=settings.list_cache_ttl_seconds
+)
@@ -0,0 +1,251 @@
+"""Road distance and drive time between freight hubs, memory-mapped from a binary file.
+
+File layout (little-endian), every section starting on a 64-byte boundary::
+
+    header  magic, hub count, grid shape and origin, cell size, snap radius
+    hubs    float32[n] latitudes, float32[n] longitudes
+    grid    int32[rows * cols]: nearest hub of each grid cell, -1 beyond the snap radius
+    km      uint16[n * n] road km from hub i to hub j, 0xFFFF when unknown
+    minutes uint16[n * n] drive minutes, 0xFFFF when unknown
+
+The matrices are opened read-only with ``numpy.memmap``: the pages are mapped
+from the page cache, so every worker process on the host shares one copy and
+only the rows actually looked up are ever read from disk.
+"""
+
+import logging
+import struct
+from collections.abc import Callable
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from app.core.config import settings
+from app.services.geo import KM_PER_DEG_LAT, haversine_km_pairwise
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ETROAD01"
+HEADER = struct.Struct("<8sIIIdddd")  # magic, n, rows, cols, min_lat, min_lng, cell_deg, snap_km
+ALIGN = 64
+UNKNOWN = 0xFFFF
+FALLBACK_KMH = 60.0
+
+# (src lat/lng, dst lat/lng) -> (km, minutes) matrices, NaN where there is no route
+TableFn = Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray]]
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _layout(n: int, rows: int, cols: int) -> dict[str, tuple[int, np.dtype, int]]:
+    """``name -> (offset, dtype, count)`` of every section after the header."""
+    sections = [
+        ("hub_lat", np.float32, n),
+        ("hub_lng", np.float32, n),
+        ("grid", np.int32, rows * cols),
+        ("km", np.uint16, n * n),
+        ("minutes", np.uint16, n * n),
+    ]
+    layout, offset = {}, _aligned(HEADER.size)
+    for name, dtype, count in sections:
+        layout[name] = (offset, np.dtype(dtype), count)
+        offset = _aligned(offset + np.dtype(dtype).itemsize * count)
+    return layout
+
+
+class RoadMatrix:
+    """O(1) road distance between points, by snapping each point to its nearest hub.
+
+    A point is snapped through the precomputed grid (one array lookup, no
+    search). The hub pair's road/straight-line ratio is then applied to the
+    straight-line distance between the actual points, so short moves around a
+    hub don't inherit the whole hub-to-hub distance. Points off the grid, on
+    the same hub, or with no known route fall back to the haversine distance.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            magic, n, rows, cols, min_lat, min_lng, cell_deg, snap_km = HEADER.unpack(
+                f.read(HEADER.size)
+            )
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: not a road matrix file")
+        self.n, self.rows, self.cols = n, rows, cols
+        self.min_lat, self.min_lng = min_lat, min_lng
+        self.cell_deg, self.snap_km = cell_deg, snap_km
+        sections = {
+            name: np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+            for name, (offset, dtype, count) in _layout(n, rows, cols).items()
+        }
+        # hubs and grid are small and touched on every lookup; keep them in the heap
+        self.hub_lat = np.array(sections["hub_lat"], dtype=np.float64)
+        self.hub_lng = np.array(sections["hub_lng"], dtype=np.float64)
+        self.grid = np.array(sections["grid"])
+        self.km = sections["km"]
+        self.minutes = sections["minutes"]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def snap(self, lats: ArrayLike, lngs: ArrayLike) -> np.ndarray:
+        """Hub index of every point, ``-1`` when no hub is within the snap radius."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        row = np.floor((lats - self.min_lat) / self.cell_deg).astype(np.int64)
+        col = np.floor((lngs - self.min_lng) / self.cell_deg).astype(np.int64)
+        inside = (row >= 0) & (row < self.rows) & (col >= 0) & (col < self.cols)
+        hubs = np.full(lats.shape, -1, dtype=np.int64)
+        hubs[inside] = self.grid[row[inside] * self.cols + col[inside]]
+        return hubs
+
+    def _scaled(
+        self, table: np.memmap, lats1, lngs1, lats2, lngs2
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Straight-line km, the hub-pair ratio of ``table`` to it, and where it applies."""
+        lats1, lngs1, lats2, lngs2 = np.broadcast_arrays(
+            *(np.asarray(a, dtype=np.float64) for a in (lats1, lngs1, lats2, lngs2))
+        )
+        direct = haversine_km_pairwise(lats1, lngs1, lats2, lngs2)
+        i, j = self.snap(lats1, lngs1), self.snap(lats2, lngs2)
+        pair = (i >= 0) & (j >= 0) & (i != j)
+        values = np.full(direct.shape, UNKNOWN, dtype=np.uint16)
+        values[pair] = table[i[pair] * self.n + j[pair]]
+        known = values != UNKNOWN
+        ratio = np.ones(direct.shape)
+        i, j = i[known], j[known]
+        hub_km = haversine_km_pairwise(
+            self.hub_lat[i], self.hub_lng[i], self.hub_lat[j], self.hub_lng[j]
+        )
+        ratio[known] = values[known] / np.maximum(hub_km, 1.0)
+        return direct, ratio, known
+
+    def km_pairwise(self, lats1, lngs1, lats2, lngs2) -> np.ndarray:
+        """Element-wise road km between two aligned (or broadcastable) arrays of points."""
+        direct, ratio, known = self._scaled(self.km, lats1, lngs1, lats2, lngs2)
+        # a road is never shorter than the straight line
+        return np.where(known, direct * np.maximum(ratio, 1.0), direct)
+
+    def km_many(self, lat: float, lng: float, lats: ArrayLike, lngs: ArrayLike) -> np.ndarray:
+        return self.km_pairwise(lat, lng, lats, lngs)
+
+    def minutes_pairwise(self, lats1, lngs1, lats2, lngs2) -> np.ndarray:
+        """Drive minutes; without a known route, the straight line at ``FALLBACK_KMH``."""
+        direct, ratio, known = self._scaled(self.minutes, lats1, lngs1, lats2, lngs2)
+        return np.where(known, direct * ratio, direct / FALLBACK_KMH * 60)
+
+
+def road_legs(
+    roads: RoadMatrix,
+    from_lat: float,
+    from_lng: float,
+    origin_lats: ArrayLike,
+    origin_lngs: ArrayLike,
+    dest_lats: ArrayLike,
+    dest_lngs: ArrayLike,
+    offered_prices: ArrayLike,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``(pickup_km, trip_km, price_per_km)`` by road for every candidate load.
+
+    The stored ``price_per_km`` is per straight-line km; it is recomputed here
+    the way :func:`trip_metrics` does, so revenue and detour use the same km.
+    """
+    pickup = roads.km_many(from_lat, from_lng, origin_lats, origin_lngs)
+    trip = roads.km_pairwise(origin_lats, origin_lngs, dest_lats, dest_lngs)
+    price_per_km = np.asarray(offered_prices, dtype=np.float64) / np.maximum(trip, 1.0)
+    return pickup, trip, price_per_km
+
+
+def _encode(values: np.ndarray) -> np.ndarray:
+    encoded = np.full(values.shape, UNKNOWN, dtype=np.uint16)
+    known = np.isfinite(values)
+    encoded[known] = np.clip(np.rint(values[known]), 0, UNKNOWN - 1)
+    return encoded
+
+
+def snap_grid(
+    hub_lat: np.ndarray, hub_lng: np.ndarray, cell_deg: float, snap_km: float
+) -> tuple[np.ndarray, float, float, int, int]:
+    """``(grid, min_lat, min_lng, rows, cols)``: the nearest hub of every cell centre."""
+    margin = snap_km / KM_PER_DEG_LAT
+    min_lat = float(np.floor((hub_lat.min() - margin) / cell_deg) * cell_deg)
+    min_lng = float(np.floor((hub_lng.min() - 2 * margin) / cell_deg) * cell_deg)
+    rows = int(np.ceil((hub_lat.max() + margin - min_lat) / cell_deg)) + 1
+    cols = int(np.ceil((hub_lng.max() + 2 * margin - min_lng) / cell_deg)) + 1
+    grid = np.full(rows * cols, -1, dtype=np.int32)
+    centre_lng = min_lng + (np.arange(cols) + 0.5) * cell_deg
+    for r in range(rows):
+        centre_lat = min_lat + (r + 0.5) * cell_deg
+        distances = haversine_km_pairwise(
+            centre_lat, centre_lng[:, None], hub_lat[None, :], hub_lng[None, :]
+        )
+        nearest = distances.argmin(axis=1)
+        within = distances[np.arange(cols), nearest] <= snap_km
+        grid[r * cols : (r + 1) * cols] = np.where(within, nearest, -1)
+    return grid, min_lat, min_lng, rows, cols
+
+
+def build_road_matrix(
+    path: str | Path,
+    hub_lat: ArrayLike,
+    hub_lng: ArrayLike,
+    table: TableFn,
+    cell_deg: float = 0.1,
+    snap_km: float = 50.0,
+    block: int = 100,
+) -> Path:
+    """Write a matrix file for the given hubs, asking ``table`` for ``block`` x ``block`` tiles.
+
+    The file is written to a temporary name and renamed into place, so workers
+    mapping the previous version keep a consistent file until they reopen.
+    """
+    hub_lat = np.asarray(hub_lat, dtype=np.float64)
+    hub_lng = np.asarray(hub_lng, dtype=np.float64)
+    n = len(hub_lat)
+    grid, min_lat, min_lng, rows, cols = snap_grid(hub_lat, hub_lng, cell_deg, snap_km)
+    layout = _layout(n, rows, cols)
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    size = max(offset + dtype.itemsize * count for offset, dtype, count in layout.values())
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, n, rows, cols, min_lat, min_lng, cell_deg, snap_km))
+        f.truncate(size)
+    sections = {
+        name: np.memmap(tmp, dtype=dtype, mode="r+", offset=offset, shape=(count,))
+        for name, (offset, dtype, count) in layout.items()
+    }
+    sections["hub_lat"][:] = hub_lat
+    sections["hub_lng"][:] = hub_lng
+    sections["grid"][:] = grid
+    km = sections["km"].reshape(n, n)
+    minutes = sections["minutes"].reshape(n, n)
+    for i in range(0, n, block):
+        for j in range(0, n, block):
+            src, dst = slice(i, i + block), slice(j, j + block)
+            tile_km, tile_minutes = table(hub_lat[src], hub_lng[src], hub_lat[dst], hub_lng[dst])
+            km[src, dst] = _encode(np.asarray(tile_km, dtype=np.float64))
+            minutes[src, dst] = _encode(np.asarray(tile_minutes, dtype=np.float64))
+    for section in sections.values():
+        section.flush()
+    del sections, km, minutes
+    tmp.replace(path)
+    return path
+
+
+@lru_cache(maxsize=4)
+def open_road_matrix(path: str | None) -> RoadMatrix | None:
+    """The matrix at ``path``, mapped once per process; ``None`` keeps straight lines."""
+    if not path:
+        return None
+    try:
+        return RoadMatrix(path)
+    except (OSError, ValueError) as exc:
+        logger.warning("road matrix unavailable, using straight-line distances: %s", exc)
+        return None
+
+
+road_matrix = open_road_matrix(settings.road_matrix_path)
@@ -0,0 +1,174 @@
+import bisect
+import time
+
+from sqlalchemy import func, literal_column, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.models import Service, ServiceStatus
+from app.services.geo import bounding_box, haversine_km_many
+from app.services.spatial_index import open_services
+from app.services.time_windows import Availability, epoch
+
+# (distance_km, service id) of the last row of a page
+Cursor = tuple[float, int]
+
+# ids per IN (...) when loading index hits; keeps well under the bind-parameter limit
+_IDS_PER_QUERY = 1000
+
+_postgis_by_url: dict[str, bool] = {}
+
+
+async def postgis_available(db: AsyncSession) -> bool:
+    """Whether the bound database has the ``services.origin_geog`` PostGIS columns."""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    key = str(bind.url)
+    if key not in _postgis_by_url:
+        _postgis_by_url[key] = bool(
+            await db.scalar(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'services' AND column_name = 'origin_geog')"
+                )
+            )
+        )
+    return _postgis_by_url[key]
+
+
+async def _postgis_near(
+    db: AsyncSession,
+    status: ServiceStatus,
+    lat: float,
+    lng: float,
+    radius_km: float,
+    after: Cursor | None = None,
+    limit: int | None = None,
+) -> list[tuple[Service, float]]:
+    origin = literal_column("services.origin_geog")
+    point = func.geography(func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326))
+    distance = func.ST_Distance(origin, point) / 1000
+    query = select(Service, distance.label("distance_km")).where(
+        Service.status == status, func.ST_DWithin(origin, point, radius_km * 1000)
+    )
+    if after is None and limit is None:
+        query = query.order_by(origin.op("<->")(point), Service.id)
+    else:
+        # a page must be ordered by exactly the key the cursor compares
+        if after is not None:
+            query = query.where(tuple_(distance, Service.id) > tuple_(*after))
+        query = query.order_by(distance, Service.id).limit(limit)
+    return [(s, float(d)) for s, d in (await db.execute(query)).all()]
+
+
+async def _indexed(
+    db: AsyncSession,
+    status: ServiceStatus,
+    hits: list[tuple[float, int]],
+    limit: int | None = None,
+) -> list[tuple[Service, float]]:
+    """Rows of ascending ``(distance, service_id)`` index hits that still have ``status``.
+
+    With ``limit`` only that many are loaded, topping up from the following hits
+    when some turn out stale (changed by another worker since indexed). Ids go
+    to the database at most ``_IDS_PER_QUERY`` at a time.
+    """
+    ranked: list[tuple[Service, float]] = []
+    start = 0
+    while start < len(hits) and (limit is None or len(ranked) < limit):
+        wanted = _IDS_PER_QUERY if limit is None else min(limit - len(ranked), _IDS_PER_QUERY)
+        end = start + wanted
+        distances = {key: d for d, key in hits[start:end]}
+        start = end
+        query = select(Service).where(Service.id.in_(distances), Service.status == status)
+        ranked.extend((s, distances[s.id]) for s in (await db.scalars(query)).all())
+    ranked.sort(key=lambda item: (item[1], item[0].id))
+    return ranked
+
+
+async def services_near(
+    db: AsyncSession,
+    status: ServiceStatus,
+    lat: float,
+    lng: float,
+    radius_km: float,
+    after: Cursor | None = None,
+    limit: int | None = None,
+) -> list[tuple[Service, float]]:
+    """Services with ``status`` whose origin lies within ``radius_km``, nearest first.
+
+    On PostGIS the search is an ``ST_DWithin`` filter with ``<->`` KNN ordering
+    over the GiST-indexed ``origin_geog`` column. Otherwise open services come
+    from the in-memory grid index when it is enabled, and every other case goes
+    to the database with a bounding-box WHERE clause (served by
+    ``ix_services_status_origin``) and only the rows inside the box are ranked
+    by exact distance.
+
+    ``after`` and ``limit`` page through the results by ``(distance, id)``; on
+    PostGIS and the index path only the requested page is loaded.
+    """
+    if settings.postgis_enabled and await postgis_available(db):
+        return await _postgis_near(db, status, lat, lng, radius_km, after, limit)
+    if settings.spatial_index_enabled and status == ServiceStatus.PUBLICADO:
+        await open_services.ensure_loaded(db)
+        hits = sorted((d, key) for key, d in open_services.query(lat, lng, radius_km))
+        if after is not None:
+            hits = hits[bisect.bisect_right(hits, tuple(after)) :]
+        return await _indexed(db, status, hits, limit)
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    query = select(Service).where(
+        Service.status == status,
+        Service.origin_lat.between(min_lat, max_lat),
+        Service.origin_lng.between(min_lng, max_lng),
+    )
+    services = (await db.scalars(query)).all()
+    distances = haversine_km_many(
+        lat, lng, [s.origin_lat for s in services], [s.origin_lng for s in services]
+    )
+    ranked = [(s, float(d)) for s, d in zip(services, distances) if d <= radius_km]
+    if after is not None:
+        ranked = [(s, d) for s, d in ranked if (d, s.id) > tuple(after)]
+    ranked.sort(key=lambda item: (item[1], item[0].id))
+    return ranked[:limit]
+
+
+async def backhaul_candidates(
+    db: AsyncSession,
+    lat: float,
+    lng: float,
+    dest_lat: float,
+    dest_lng: float,
+    radius_km: float,
+    availability: Availability,
+) -> list[tuple[Service, float]]:
+    """Open services to score for a driver at ``(lat, lng)`` bound for ``(dest_lat, dest_lng)``.
+
+    Only loads the driver can reach inside their pickup window while available
+    are returned. On PostGIS every open service within the radius comes from
+    the ``ST_DWithin`` search of :func:`services_near`. Otherwise, with the
+    corridor index, closed windows are expired and windows outside the
+    availability dropped before any distance is computed, and only the
+    corridors nearest the intended destination are visited, widening until
+    ``corridor_min_candidates`` are found within ``radius_km``. Without it
+    every open service within the radius is checked.
+    """
+    if settings.postgis_enabled and await postgis_available(db):
+        candidates = await _postgis_near(db, ServiceStatus.PUBLICADO, lat, lng, radius_km)
+    elif settings.spatial_index_enabled and settings.corridor_index_enabled:
+        await open_services.ensure_loaded(db)
+        open_services.corridors.expire(time.time())
+        hits = open_services.corridors.query(
+            lat, lng, dest_lat, dest_lng, radius_km, settings.corridor_min_candidates, availability
+        )
+        hits = sorted((d, key) for key, d in hits)
+        candidates = await _indexed(db, ServiceStatus.PUBLICADO, hits)
+    else:
+        candidates = await services_near(db, ServiceStatus.PUBLICADO, lat, lng, radius_km)
+    # the index may lag behind edits made by other workers; the loaded rows are authoritative
+    feasible = availability.feasible(
+        [d for _, d in candidates],
+        [epoch(s.pickup_window_start) for s, _ in candidates],
+        [epoch(s.pickup_window_end) for s, _ in candidates],
+    )
+    return [item for item, ok in zip(candidates, feasible) if ok]
@@ -0,0 +1,388 @@
+import asyncio
+import heapq
+import math
+import threading
+import time
+from collections.abc import Collection
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.models import Service, ServiceStatus
+from app.services.geo import KM_PER_DEG_LAT, haversine_km_many, within_radius_mask
+from app.services.time_windows import Availability, epoch
+
+Cell = tuple[int, int]
+
+
+def grid_cell(lat: float, lng: float, cell_deg: float) -> Cell:
+    return math.floor(lat / cell_deg), math.floor(lng / cell_deg)
+
+
+def cells_in_radius(
+    occupied: Collection[Cell], cell_deg: float, lat: float, lng: float, radius_km: float
+) -> list[Cell]:
+    """Cells of a ``cell_deg`` grid overlapping the bounding box of a radius query.
+
+    When the box spans more cells than are ``occupied`` (wide radius, sparse
+    grid), the occupied cells inside it are returned instead of the full box.
+    """
+    dlat = radius_km / KM_PER_DEG_LAT
+    lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    cos_lat = min(math.cos(math.radians(lat_lo)), math.cos(math.radians(lat_hi)))
+    if cos_lat <= 0 or radius_km / (KM_PER_DEG_LAT * cos_lat) >= 180:
+        r0, r1 = grid_cell(lat_lo, lng, cell_deg)[0], grid_cell(lat_hi, lng, cell_deg)[0]
+        return [c for c in occupied if r0 <= c[0] <= r1]
+    dlng = radius_km / (KM_PER_DEG_LAT * cos_lat)
+    r0, r1 = grid_cell(lat_lo, lng - dlng, cell_deg)[0], grid_cell(lat_hi, lng + dlng, cell_deg)[0]
+    c0, c1 = grid_cell(lat, lng - dlng, cell_deg)[1], grid_cell(lat, lng + dlng, cell_deg)[1]
+    if (r1 - r0 + 1) * (c1 - c0 + 1) > len(occupied):
+        return [c for c in occupied if r0 <= c[0] <= r1 and c0 <= c[1] <= c1]
+    return [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+
+class GridIndex:
+    """Uniform lat/lng grid of points, queried by radius.
+
+    Only the cells overlapping the query's bounding box are visited, so the cost
+    of a lookup depends on how many points live nearby, not on the total size.
+    """
+
+    def __init__(self, cell_deg: float = 0.5):
+        self.cell_deg = cell_deg
+        self._cells: dict[tuple[int, int], dict[int, tuple[float, float]]] = {}
+        self._points: dict[int, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return grid_cell(lat, lng, self.cell_deg)
+
+    def upsert(self, key: int, lat: float, lng: float) -> None:
+        with self._lock:
+            self._discard(key)
+            self._points[key] = (lat, lng)
+            self._cells.setdefault(self._cell(lat, lng), {})[key] = (lat, lng)
+
+    def remove(self, key: int) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def replace(self, points: list[tuple[int, float, float]]) -> None:
+        cells: dict[tuple[int, int], dict[int, tuple[float, float]]] = {}
+        for key, lat, lng in points:
+            cells.setdefault(self._cell(lat, lng), {})[key] = (lat, lng)
+        with self._lock:
+            self._cells = cells
+            self._points = {key: (lat, lng) for key, lat, lng in points}
+
+    def _discard(self, key: int) -> None:
+        old = self._points.pop(key, None)
+        if old is None:
+            return
+        cell = self._cell(*old)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def _cells_in_radius(self, lat: float, lng: float, radius_km: float) -> list[tuple[int, int]]:
+        return cells_in_radius(self._cells, self.cell_deg, lat, lng, radius_km)
+
+    def query(self, lat: float, lng: float, radius_km: float) -> list[tuple[int, float]]:
+        """Return ``(key, distance_km)`` for every point within ``radius_km``."""
+        with self._lock:
+            candidates = [
+                item
+                for cell in self._cells_in_radius(lat, lng, radius_km)
+                for item in self._cells.get(cell, {}).items()
+            ]
+        if not candidates:
+            return []
+        keys = np.fromiter((key for key, _ in candidates), dtype=np.int64, count=len(candidates))
+        coords = np.array([point for _, point in candidates], dtype=np.float64)
+        near = within_radius_mask(lat, lng, coords[:, 0], coords[:, 1], radius_km)
+        keys, coords = keys[near], coords[near]
+        distances = haversine_km_many(lat, lng, coords[:, 0], coords[:, 1])
+        inside = distances <= radius_km
+        return list(zip(keys[inside].tolist(), distances[inside].tolist()))
+
+
+# (lat, lng, pickup window opens, closes), window bounds in epoch seconds
+CorridorPoint = tuple[float, float, float, float]
+
+
+class CorridorIndex:
+    """Loads bucketed by their ``(origin cell, destination cell)`` corridor, with pickup windows.
+
+    A query asks for loads that start near one place and end near another. It
+    walks rings of corridors outwards: ring ``k`` holds every corridor whose
+    origin and destination cells are both at most ``k`` cells (Chebyshev) from
+    the queried ones. Whole rings are taken until enough loads lie within the
+    pickup radius, so the cost follows the loads heading the right way, not
+    every load near the origin.
+
+    Windows are kept in a min-heap by closing time: :meth:`expire` drops closed
+    ones in order, and a query discards windows outside the driver's
+    availability before computing any distance.
+    """
+
+    def __init__(self, cell_deg: float = 0.5):
+        self.cell_deg = cell_deg
+        self._corridors: dict[Cell, dict[Cell, dict[int, CorridorPoint]]] = {}
+        self._points: dict[int, tuple[float, float, float, float, float, float]] = {}
+        self._closing: list[tuple[float, int]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return grid_cell(lat, lng, self.cell_deg)
+
+    def upsert(
+        self,
+        key: int,
+        lat: float,
+        lng: float,
+        dest_lat: float,
+        dest_lng: float,
+        opens: float = -math.inf,
+        closes: float = math.inf,
+    ) -> None:
+        with self._lock:
+            self._discard(key)
+            self._points[key] = (lat, lng, dest_lat, dest_lng, opens, closes)
+            by_dest = self._corridors.setdefault(self._cell(lat, lng), {})
+            by_dest.setdefault(self._cell(dest_lat, dest_lng), {})[key] = (lat, lng, opens, closes)
+            heapq.heappush(self._closing, (closes, key))
+
+    def remove(self, key: int) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def replace(self, points: list[tuple[int, float, float, float, float, float, float]]) -> None:
+        """Swap in ``(key, lat, lng, dest_lat, dest_lng, opens, closes)`` points."""
+        corridors: dict[Cell, dict[Cell, dict[int, CorridorPoint]]] = {}
+        for key, lat, lng, dest_lat, dest_lng, opens, closes in points:
+            by_dest = corridors.setdefault(self._cell(lat, lng), {})
+            by_dest.setdefault(self._cell(dest_lat, dest_lng), {})[key] = (lat, lng, opens, closes)
+        closing = [(point[6], point[0]) for point in points]
+        heapq.heapify(closing)
+        with self._lock:
+            self._corridors = corridors
+            self._points = {key: tuple(point) for key, *point in points}
+            self._closing = closing
+
+    def expire(self, now: float) -> int:
+        """Drop every load whose pickup window closed before ``now``; returns how many."""
+        expired = 0
+        with self._lock:
+            while self._closing and self._closing[0][0] < now:
+                closes, key = heapq.heappop(self._closing)
+                point = self._points.get(key)
+                # entries left behind by an upsert or remove are skipped
+                if point is not None and point[5] == closes:
+                    self._discard(key)
+                    expired += 1
+        return expired
+
+    def _discard(self, key: int) -> None:
+        old = self._points.pop(key, None)
+        if old is None:
+            return
+        origin, dest = self._cell(old[0], old[1]), self._cell(old[2], old[3])
+        by_dest = self._corridors.get(origin)
+        if by_dest is None:
+            return
+        bucket = by_dest.get(dest)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del by_dest[dest]
+        if not by_dest:
+            del self._corridors[origin]
+
+    def _rings(
+        self, lat: float, lng: float, dest_lat: float, dest_lng: float, radius_km: float
+    ) -> list[list[dict[int, CorridorPoint]]]:
+        """Corridor buckets leaving the radius box, grouped by ring, nearest ring first."""
+        (o_row, o_col), (d_row, d_col) = self._cell(lat, lng), self._cell(dest_lat, dest_lng)
+        rings: dict[int, list[dict[int, CorridorPoint]]] = {}
+        with self._lock:
+            for row, col in cells_in_radius(self._corridors, self.cell_deg, lat, lng, radius_km):
+                by_dest = self._corridors.get((row, col))
+                if by_dest is None:
+                    continue
+                origin_ring = max(abs(row - o_row), abs(col - o_col))
+                for (dest_row, dest_col), bucket in by_dest.items():
+                    ring = max(origin_ring, abs(dest_row - d_row), abs(dest_col - d_col))
+                    rings.setdefault(ring, []).append(bucket)
+        return [rings[ring] for ring in sorted(rings)]
+
+    def query(
+        self,
+        lat: float,
+        lng: float,
+        dest_lat: float,
+        dest_lng: float,
+        radius_km: float,
+        min_candidates: int,
+        availability: Availability | None = None,
+    ) -> list[tuple[int, float]]:
+        """``(key, pickup_km)`` of loads within ``radius_km`` of ``(lat, lng)``.
+
+        Corridors closest to ``(dest_lat, dest_lng)`` come first, and the walk
+        stops after the first complete ring that reaches ``min_candidates``.
+        With ``availability``, only loads the driver can reach within their
+        pickup window count, by straight-line distance.
+        """
+        found: list[tuple[int, float]] = []
+        for buckets in self._rings(lat, lng, dest_lat, dest_lng, radius_km):
+            with self._lock:
+                points = [item for bucket in buckets for item in bucket.items()]
+            if not points:
+                continue
+            keys = np.fromiter((key for key, _ in points), dtype=np.int64, count=len(points))
+            values = np.array([point for _, point in points], dtype=np.float64)
+            if availability is not None:
+                overlapping = availability.overlapping(values[:, 2], values[:, 3])
+                keys, values = keys[overlapping], values[overlapping]
+            distances = haversine_km_many(lat, lng, values[:, 0], values[:, 1])
+            inside = distances <= radius_km
+            if availability is not None:
+                inside &= availability.reachable(distances, values[:, 3])
+            found.extend(zip(keys[inside].tolist(), distances[inside].tolist()))
+            if len(found) >= min_candidates:
+                break
+        return found
+
+
+class OpenServiceIndex(GridIndex):
+    """Grid of PUBLICADO service origins, rebuilt from the database periodically.
+
+    Mutation endpoints call :meth:`sync` so the local worker sees its own writes
+    immediately; the periodic rebuild picks up writes made by other workers.
+    ``corridors`` holds the same services keyed by origin and destination and
+    is loaded and synced alongside.
+
+    One rebuild runs at a time per worker; requests arriving meanwhile wait for
+    it instead of issuing their own. Writes synced while the rebuild's query is
+    in flight are logged and replayed over its (older) snapshot.
+    """
+
+    def __init__(self, cell_deg: float = 0.5, refresh_seconds: float = 60):
+        super().__init__(cell_deg)
+        self.corridors = CorridorIndex(cell_deg)
+        self.refresh_seconds = refresh_seconds
+        self._loaded_at: float | None = None
+        self._reload_lock: asyncio.Lock | None = None
+        self._reload_loop: asyncio.AbstractEventLoop | None = None
+        # key -> add() arguments, or None for a removal, while a rebuild is loading
+        self._pending: dict[int, tuple | None] | None = None
+
+    def _fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.refresh_seconds
+        )
+
+    def _reload_guard(self) -> asyncio.Lock:
+        # asyncio locks are bound to one loop; TestClient and benchmarks use several
+        loop = asyncio.get_running_loop()
+        if self._reload_lock is None or self._reload_loop is not loop:
+            self._reload_lock, self._reload_loop = asyncio.Lock(), loop
+        return self._reload_lock
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if self._fresh():
+            return
+        async with self._reload_guard():
+            if self._fresh():
+                return
+            now = time.monotonic()
+            self._pending = {}
+            try:
+                result = await db.execute(
+                    select(
+                        Service.id,
+                        Service.origin_lat,
+                        Service.origin_lng,
+                        Service.dest_lat,
+                        Service.dest_lng,
+                        Service.pickup_window_start,
+                        Service.pickup_window_end,
+                    ).where(Service.status == ServiceStatus.PUBLICADO)
+                )
+                rows = result.all()
+            finally:
+                pending, self._pending = self._pending, None
+            self.replace([(r.id, r.origin_lat, r.origin_lng) for r in rows])
+            self.corridors.replace(
+                [(*r[:5], epoch(r.pickup_window_start), epoch(r.pickup_window_end)) for r in rows]
+            )
+            for key, point in pending.items():
+                if point is None:
+                    self.remove(key)
+                else:
+                    self.add(key, *point)
+            self._loaded_at = now
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def add(
+        self,
+        key: int,
+        lat: float,
+        lng: float,
+        dest_lat: float,
+        dest_lng: float,
+        pickup_window_start: datetime,
+        pickup_window_end: datetime,
+    ) -> None:
+        if self._pending is not None:
+            self._pending[key] = (
+                lat,
+                lng,
+                dest_lat,
+                dest_lng,
+                pickup_window_start,
+                pickup_window_end,
+            )
+        self.upsert(key, lat, lng)
+        self.corridors.upsert(
+            key, lat, lng, dest_lat, dest_lng, epoch(pickup_window_start), epoch(pickup_window_end)
+        )
+
+    def remove(self, key: int) -> None:
+        if self._pending is not None:
+            self._pending[key] = None
+        super().remove(key)
+        self.corridors.remove(key)
+
+    def sync(self, service: Service) -> None:
+        if service.status == ServiceStatus.PUBLICADO:
+            self.add(
+                service.id,
+                service.origin_lat,
+                service.origin_lng,
+                service.dest_lat,
+                service.dest_lng,
+                service.pickup_window_start,
+                service.pickup_window_end,
+            )
+        else:
+            self.remove(service.id)
+
+
+open_services = OpenServiceIndex(
+    cell_deg=settings.spatial_index_cell_deg,
+    refresh_seconds=settings.spatial_index_refresh_seconds,
+)
@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Protocol
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from app.core.config import settings
+
+
+class HasAvailability(Protocol):
+    available_from: datetime
+    available_to: datetime
+
+
+def epoch(moment: datetime) -> float:
+    """Seconds since the epoch; naive datetimes are UTC, as everywhere in the models."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+@dataclass(frozen=True)
+class Availability:
+    """When a driver can set off and by when they must have picked up, in epoch seconds."""
+
+    start: float
+    end: float
+    speed_kmh: float
+
+    def overlapping(self, opens: ArrayLike, closes: ArrayLike) -> np.ndarray:
+        """Pickup windows open at some point while the driver is available."""
+        opens = np.asarray(opens, dtype=np.float64)
+        closes = np.asarray(closes, dtype=np.float64)
+        return (closes >= self.start) & (opens <= self.end) & (self.start <= self.end)
+
+    def reachable(self, pickup_km: ArrayLike, closes: ArrayLike) -> np.ndarray:
+        """Loads reached at ``speed_kmh`` before both the window and the availability end.
+
+        Arriving early is fine, the driver waits for the window to open.
+        """
+        arrival = self.start + np.asarray(pickup_km, dtype=np.float64) / self.speed_kmh * 3600
+        return arrival <= np.minimum(np.asarray(closes, dtype=np.float64), self.end)
+
+    def feasible(self, pickup_km: ArrayLike, opens: ArrayLike, closes: ArrayLike) -> np.ndarray:
+        return self.overlapping(opens, closes) & self.reachable(pickup_km, closes)
+
+
+def driver_availability(now: datetime, intent: HasAvailability | None = None) -> Availability:
+    """The driver's availability from ``now``: their intent's, or the default horizon.
+
+    An intent whose availability has already ended counts as no intent at all.
+    """
+    if intent is None or intent.available_to <= now:
+        start = now
+        end = now + timedelta(hours=settings.backhaul_default_availability_hours)
+    else:
+        start, end = max(now, intent.available_from), intent.available_to
+    return Availability(epoch(start), epoch(end), settings.backhaul_speed_kmh)
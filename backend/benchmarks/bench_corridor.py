@@ -0,0 +1,74 @@
+"""Candidates scored per backhaul query: radius-only retrieval versus the corridor index.
+
+Both indexes are filled in memory with synthetic loads spread around the
+logistics hubs of :mod:`benchmarks.dataset`, with 6-hour pickup windows over
+the next three days as in ``service_rows``. They are queried from drivers
+placed the same way, each heading to a random hub and available for the next
+``backhaul_default_availability_hours``::
+
+    python -m benchmarks.bench_corridor --services 1000000 --radius-km 300
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.core.config import settings
+from app.services.spatial_index import CorridorIndex, GridIndex
+from app.services.time_windows import Availability
+from benchmarks.dataset import near_hub
+
+
+def _run(query, drivers) -> tuple[list[int], list[float]]:
+    counts, timings = [], []
+    for driver in drivers:
+        start = time.perf_counter()
+        counts.append(len(query(*driver)))
+        timings.append((time.perf_counter() - start) * 1000)
+    return counts, timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--services", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius-km", type=float, default=200)
+    parser.add_argument("--cell-deg", type=float, default=settings.spatial_index_cell_deg)
+    parser.add_argument("--min-candidates", type=int, default=settings.corridor_min_candidates)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = time.time()
+    points = []
+    for i in range(args.services):
+        opens = now + rng.randint(0, 72) * 3600
+        points.append((i, *near_hub(rng)[1:], *near_hub(rng)[1:], opens, opens + 6 * 3600))
+    grid, corridors = GridIndex(args.cell_deg), CorridorIndex(args.cell_deg)
+    grid.replace([p[:3] for p in points])
+    corridors.replace(points)
+    hours = settings.backhaul_default_availability_hours
+    available = Availability(now, now + hours * 3600, settings.backhaul_speed_kmh)
+    drivers = [(*near_hub(rng, 1.0)[1:], *near_hub(rng)[1:]) for _ in range(args.queries)]
+
+    modes = {
+        "radius": lambda lat, lng, _dlat, _dlng: grid.query(lat, lng, args.radius_km),
+        "corridor": lambda lat, lng, dlat, dlng: corridors.query(
+            lat, lng, dlat, dlng, args.radius_km, args.min_candidates
+        ),
+        "+windows": lambda lat, lng, dlat, dlng: corridors.query(
+            lat, lng, dlat, dlng, args.radius_km, args.min_candidates, available
+        ),
+    }
+    print(f"{'mode':<9} {'mean cand':>10} {'p50 cand':>9} {'max cand':>9} {'p50 ms':>8}")
+    for name, query in modes.items():
+        counts, timings = _run(query, drivers)
+        print(
+            f"{name:<9} {statistics.mean(counts):>10.0f} {statistics.median(counts):>9.0f} "
+            f"{max(counts):>9} {statistics.median(timings):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
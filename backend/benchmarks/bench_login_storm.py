@@ -0,0 +1,90 @@
+"""Read-endpoint latency before and during a login storm, against a running API.
+
+    uvicorn app.main:app --workers 1 &
+    python -m benchmarks.bench_login_storm --base-url http://localhost:8000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+
+async def _probe_reads(client: httpx.AsyncClient, path: str, stop: asyncio.Event) -> list[float]:
+    timings = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        r = await client.get(path)
+        r.raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+    return timings
+
+
+async def _login_loop(client: httpx.AsyncClient, email: str, stop: asyncio.Event, codes: Counter):
+    while not stop.is_set():
+        r = await client.post("/auth/login", json={"email": email, "password": "bench-pass"})
+        codes[r.status_code] += 1
+        if r.status_code == 503:
+            await asyncio.sleep(float(r.headers.get("Retry-After", 1)))
+
+
+def _summary(label: str, timings: list[float]) -> str:
+    p95 = timings[0]
+    if len(timings) > 1:
+        p95 = statistics.quantiles(timings, n=20, method="inclusive")[-1]
+    return (
+        f"{label:<10} n={len(timings):<6} p50={statistics.median(timings):8.2f} ms "
+        f"p95={p95:8.2f} ms max={max(timings):8.2f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--read-path", default="/services/summary?limit=20")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        run = uuid.uuid4().hex[:8]
+        emails = [f"storm-{run}-{i}@example.com" for i in range(args.users)]
+        for email in emails:
+            r = await client.post(
+                "/auth/register",
+                json={"name": "storm", "email": email, "password": "bench-pass", "role": "DRIVER"},
+            )
+            r.raise_for_status()
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_reads(client, args.read_path, stop))
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        baseline = await probe
+
+        stop = asyncio.Event()
+        codes: Counter = Counter()
+        storm = [
+            asyncio.create_task(_login_loop(client, emails[i % len(emails)], stop, codes))
+            for i in range(args.concurrency)
+        ]
+        probe = asyncio.create_task(_probe_reads(client, args.read_path, stop))
+        await asyncio.sleep(args.seconds)
+        stop.set()
+        during = await probe
+        await asyncio.gather(*storm)
+
+    print(_summary("baseline", baseline))
+    print(_summary("storm", during))
+    print("login responses:", dict(codes))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
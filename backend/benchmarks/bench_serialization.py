@@ -0,0 +1,105 @@
+"""Rows per second and peak memory of the standard and fast list serialization paths.
+
+The standard path loads ORM entities and goes through ``TypeAdapter`` the way
+FastAPI serializes a ``response_model``; the fast path selects row tuples and
+encodes them with :class:`app.services.fast_json.RowEncoder`::
+
+    python -m benchmarks.bench_serialization --rows 20000
+
+Without ``--database-url`` a throwaway SQLite file is created and filled.
+"""
+
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base
+from app.models.models import Service, ServiceStatus, User, UserRole
+from app.schemas.schemas import ServiceOut
+from app.services.fast_json import RowEncoder
+from benchmarks.dataset import service_rows
+
+
+def standard(db, limit: int) -> bytes:
+    adapter = TypeAdapter(list[ServiceOut])
+    services = db.scalars(
+        select(Service).where(Service.status == ServiceStatus.PUBLICADO).limit(limit)
+    ).all()
+    content = adapter.dump_python(adapter.validate_python(services), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def fast(db, limit: int) -> bytes:
+    encoder = RowEncoder(ServiceOut)
+    rows = db.execute(
+        select(*encoder.columns(Service))
+        .where(Service.status == ServiceStatus.PUBLICADO)
+        .limit(limit)
+    ).all()
+    return encoder.encode(rows)
+
+
+def _measure(session_factory, fn, limit: int, repeats: int) -> tuple[float, float, int]:
+    best = float("inf")
+    peak = 0
+    for _ in range(repeats):
+        with session_factory() as db:
+            tracemalloc.start()
+            start = time.perf_counter()
+            body = fn(db, limit)
+            best = min(best, time.perf_counter() - start)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return best, peak, len(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = None
+    url = args.database_url
+    if url is None:
+        tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{Path(tmp.name) / 'bench.db'}"
+    engine = create_engine(url)
+    session_factory = sessionmaker(bind=engine)
+    if tmp is not None:
+        Base.metadata.create_all(engine)
+        with session_factory() as db:
+            user = User(
+                name="bench", email="bench@example.com", password_hash="-", role=UserRole.SHIPPER
+            )
+            db.add(user)
+            db.commit()
+            rows = service_rows([user.id], args.rows, random.Random(args.seed))
+            for start in range(0, len(rows), 5000):
+                db.execute(insert(Service), rows[start : start + 5000])
+            db.commit()
+
+    print(f"{'path':<9} {'rows/s':>10} {'seconds':>8} {'peak MiB':>9} {'bytes':>10}")
+    for name, fn in (("standard", standard), ("fast", fast)):
+        seconds, peak, size = _measure(session_factory, fn, args.rows, args.repeats)
+        print(
+            f"{name:<9} {args.rows / seconds:>10.0f} {seconds:>8.3f} "
+            f"{peak / 2**20:>9.1f} {size:>10}"
+        )
+    engine.dispose()
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Synthetic, seed-reproducible Brazil-wide freight data for the benchmarks.
+
+Shippers, drivers and services are clustered around the main freight hubs;
+every row a run creates is tagged through the users' e-mails so it can be
+removed again with :func:`drop`.
+"""
+
+import random
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.engine import Engine
+
+from app.core.security import hash_password
+from app.models.models import (
+    Assignment,
+    BackhaulSuggestion,
+    DriverIntent,
+    DriverProfile,
+    Offer,
+    Service,
+    ServiceChange,
+    ServiceStatus,
+    ShipperProfile,
+    User,
+    UserRole,
+    trip_metrics,
+)
+
+HUBS = [
+    ("São Paulo/SP", -23.55, -46.63),
+    ("Rio de Janeiro/RJ", -22.91, -43.17),
+    ("Belo Horizonte/MG", -19.92, -43.94),
+    ("Curitiba/PR", -25.43, -49.27),
+    ("Porto Alegre/RS", -30.03, -51.23),
+    ("Brasília/DF", -15.79, -47.88),
+    ("Salvador/BA", -12.97, -38.50),
+    ("Recife/PE", -8.05, -34.88),
+    ("Fortaleza/CE", -3.73, -38.52),
+    ("Manaus/AM", -3.12, -60.02),
+    ("Belém/PA", -1.46, -48.50),
+    ("Goiânia/GO", -16.68, -49.25),
+]
+# services / shippers / drivers of the named dataset sizes
+SIZES = {
+    "10k": (10_000, 100, 500),
+    "100k": (100_000, 1_000, 5_000),
+    "1m": (1_000_000, 10_000, 50_000),
+}
+PASSWORD = "bench-pass"
+CHUNK = 5000
+
+
+def near_hub(rng: random.Random, spread_deg: float = 1.5) -> tuple[str, float, float]:
+    name, lat, lng = rng.choice(HUBS)
+    return name, lat + rng.gauss(0, spread_deg), lng + rng.gauss(0, spread_deg)
+
+
+def service_rows(
+    shipper_ids: Sequence[int], n: int, rng: random.Random, start: int = 0
+) -> list[dict]:
+    now = datetime.utcnow()
+    rows = []
+    for i in range(start, start + n):
+        o_name, o_lat, o_lng = near_hub(rng)
+        d_name, d_lat, d_lng = near_hub(rng)
+        price = round(rng.uniform(500, 15000), 2)
+        trip_km, price_per_km = trip_metrics(o_lat, o_lng, d_lat, d_lng, price)
+        pickup = now + timedelta(hours=rng.randint(0, 72))
+        rows.append(
+            {
+                "created_by_user_id": rng.choice(shipper_ids),
+                "title": f"bench {i}",
+                "description": "bench",
+                "service_type": rng.choice(("LOTACAO", "FRACIONADA")),
+                "origin_address": o_name,
+                "origin_lat": o_lat,
+                "origin_lng": o_lng,
+                "dest_address": d_name,
+                "dest_lat": d_lat,
+                "dest_lng": d_lng,
+                "pickup_window_start": pickup,
+                "pickup_window_end": pickup + timedelta(hours=6),
+                "delivery_window_start": pickup + timedelta(hours=12),
+                "delivery_window_end": pickup + timedelta(days=2),
+                "offered_price": price,
+                "trip_km": trip_km,
+                "price_per_km": price_per_km,
+                "status": ServiceStatus.PUBLICADO,
+                "created_at": now,
+            }
+        )
+    return rows
+
+
+@dataclass
+class Dataset:
+    tag: str
+    services: int
+    shipper_ids: list[int]
+    driver_ids: list[int]
+    service_ids: range
+
+    def email(self, kind: str, i: int) -> str:
+        return f"{self.tag}-{kind}-{i}@bench.example.com"
+
+
+def _insert_users(db, tag: str, kind: str, role: UserRole, n: int, password_hash: str):
+    ids = []
+    for start in range(0, n, CHUNK):
+        rows = [
+            {
+                "name": f"{kind} {i}",
+                "email": f"{tag}-{kind}-{i}@bench.example.com",
+                "password_hash": password_hash,
+                "role": role,
+            }
+            for i in range(start, min(n, start + CHUNK))
+        ]
+        query = insert(User).returning(User.id, sort_by_parameter_order=True)
+        ids.extend(db.scalars(query, rows).all())
+    return ids
+
+
+def seed(
+    engine: Engine, services: int, shippers: int, drivers: int, seed: int = 42
+) -> Dataset:
+    """Insert ``shippers``, ``drivers`` (with profiles and intents) and ``services``."""
+    rng = random.Random(seed)
+    tag = f"bench{seed}-{time.time_ns():x}"
+    password_hash = hash_password(PASSWORD)
+    with engine.begin() as db:
+        shipper_ids = _insert_users(db, tag, "shipper", UserRole.SHIPPER, shippers, password_hash)
+        driver_ids = _insert_users(db, tag, "driver", UserRole.DRIVER, drivers, password_hash)
+        db.execute(
+            insert(ShipperProfile), [{"user_id": i, "profile_type": "PJ"} for i in shipper_ids]
+        )
+        now = datetime.utcnow()
+        profiles, intents = [], []
+        for driver_id in driver_ids:
+            base, lat, lng = near_hub(rng)
+            dest, dest_lat, dest_lng = near_hub(rng)
+            profiles.append(
+                {
+                    "user_id": driver_id,
+                    "vehicle_type": rng.choice(("truck", "carreta", "bitrem")),
+                    "capacity_kg": rng.choice((8000, 14000, 27000, 37000)),
+                    "base_city": base.split("/")[0],
+                    "base_state": base.split("/")[1],
+                }
+            )
+            intents.append(
+                {
+                    "driver_user_id": driver_id,
+                    "current_lat": lat,
+                    "current_lng": lng,
+                    "intended_dest_lat": dest_lat,
+                    "intended_dest_lng": dest_lng,
+                    "intended_dest_address": dest,
+                    "available_from": now,
+                    "available_to": now + timedelta(days=3),
+                }
+            )
+        for start in range(0, len(profiles), CHUNK):
+            db.execute(insert(DriverProfile), profiles[start : start + CHUNK])
+            db.execute(insert(DriverIntent), intents[start : start + CHUNK])
+        for start in range(0, services, CHUNK):
+            n = min(CHUNK, services - start)
+            db.execute(insert(Service), service_rows(shipper_ids, n, rng, start))
+        first, last = db.execute(
+            select(func.min(Service.id), func.max(Service.id)).where(
+                Service.created_by_user_id.in_(select(User.id).where(_tagged(tag)))
+            )
+        ).one()
+    ids = range(first, last + 1) if services else range(0)
+    return Dataset(tag, services, shipper_ids, driver_ids, ids)
+
+
+def _tagged(tag: str):
+    return User.email.like(f"{tag}-%")
+
+
+def drop(engine: Engine, dataset: Dataset) -> None:
+    """Delete everything created for (and during) the run of ``dataset``."""
+    users = select(User.id).where(_tagged(dataset.tag))
+    services = select(Service.id).where(Service.created_by_user_id.in_(users))
+    with engine.begin() as db:
+        suggestions = or_(
+            BackhaulSuggestion.driver_user_id.in_(users),
+            BackhaulSuggestion.service_id.in_(services),
+        )
+        db.execute(delete(BackhaulSuggestion).where(suggestions))
+        db.execute(delete(Assignment).where(Assignment.service_id.in_(services)))
+        db.execute(delete(ServiceChange).where(ServiceChange.service_id.in_(services)))
+        db.execute(delete(Offer).where(Offer.service_id.in_(services)))
+        db.execute(delete(Service).where(Service.id.in_(services)))
+        db.execute(delete(DriverIntent).where(DriverIntent.driver_user_id.in_(users)))
+        db.execute(delete(DriverProfile).where(DriverProfile.user_id.in_(users)))
+        db.execute(delete(ShipperProfile).where(ShipperProfile.user_id.in_(users)))
+        db.execute(delete(User).where(User.id.in_(users)))
@@ -1,29 +1,46 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 
+import httpx
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
+from app.core.config import settings
 from app.core.db import Base, get_db
-from app.main import app
+from app.core.metrics import MetricsMiddleware, RequestMetrics
+from app.main import app, stream_services
+from app.models.models import ServiceChange
+from app.services import search
+from app.services.batch_matching import run_backhaul_batch
+from app.services.live_feed import service_feed
+from app.services.pagination import encode_cursor
+from app.services.response_cache import list_cache
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
+# TestClient may run each request on a fresh event loop, so don't pool async connections.
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
 client = TestClient(app)
+settings.internal_token = "interno"
+INTERNAL = {"Authorization": "Bearer interno"}
 
 
 def reg_and_login(name, email, role):
@@ -32,6 +49,10 @@ def reg_and_login(name, email, role):
         json={"name": name, "email": email, "password": "123456", "role": role},
     )
     assert r.status_code == 200
+    return login(email)
+
+
+def login(email):
     tok = client.post("/auth/login", json={"email": email, "password": "123456"}).json()["access_token"]
     return {"Authorization": f"Bearer {tok}"}
 
@@ -120,3 +141,837 @@ def test_service_offer_and_backhaul_flow():
     )
     assert sug.status_code == 200
     assert len(sug.json()) >= 1
+
+
+def test_list_services_near_uses_radius():
+    shipper = reg_and_login("ship2", "ship2@x.com", "SHIPPER")
+    now = datetime.utcnow()
+    base = {
+        "description": "Caixas",
+        "service_type": "LOTACAO",
+        "origin_address": "Recife",
+        "origin_lat": -8.05,
+        "origin_lng": -34.88,
+        "dest_address": "Natal",
+        "dest_lat": -5.79,
+        "dest_lng": -35.21,
+        "pickup_window_start": now.isoformat(),
+        "pickup_window_end": (now + timedelta(hours=2)).isoformat(),
+        "delivery_window_start": (now + timedelta(hours=3)).isoformat(),
+        "delivery_window_end": (now + timedelta(hours=8)).isoformat(),
+        "offered_price": 900,
+    }
+    near = client.post("/services", json={**base, "title": "Recife-Natal"}, headers=shipper).json()
+    far = client.post(
+        "/services",
+        json={**base, "title": "Manaus-Natal", "origin_lat": -3.12, "origin_lng": -60.02},
+        headers=shipper,
+    ).json()
+
+    params = {"near_lat": -8.06, "near_lng": -34.90, "radius_km": 50}
+    ids = {s["id"] for s in client.get("/services", params=params).json()}
+    assert near["id"] in ids
+    assert far["id"] not in ids
+
+    driver = reg_and_login("drv2", "drv2@x.com", "DRIVER")
+    offer = client.post(
+        f"/services/{near['id']}/offers", headers=driver, json={"kind": "COUNTER", "price": 1000}
+    )
+    assert offer.status_code == 200
+    ids = {s["id"] for s in client.get("/services", params=params).json()}
+    assert near["id"] not in ids
+    params["status"] = "EM_NEGOCIACAO"
+    ids = {s["id"] for s in client.get("/services", params=params).json()}
+    assert near["id"] in ids
+
+    for bad in ("nan", "inf", "91"):
+        assert client.get("/services", params={**params, "near_lat": bad}).status_code == 422
+
+
+def test_my_services_keyset_pagination():
+    shipper = reg_and_login("ship3", "ship3@x.com", "SHIPPER")
+    now = datetime.utcnow()
+    payload = {
+        "description": "Grãos",
+        "service_type": "GRANEL",
+        "origin_address": "Sorriso",
+        "origin_lat": -12.55,
+        "origin_lng": -55.72,
+        "dest_address": "Santos",
+        "dest_lat": -23.96,
+        "dest_lng": -46.33,
+        "pickup_window_start": now.isoformat(),
+        "pickup_window_end": (now + timedelta(hours=2)).isoformat(),
+        "delivery_window_start": (now + timedelta(days=2)).isoformat(),
+        "delivery_window_end": (now + timedelta(days=3)).isoformat(),
+        "offered_price": 12000,
+    }
+    created = [
+        client.post("/services", json={**payload, "title": f"Soja {i}"}, headers=shipper)
+        .json()["id"]
+        for i in range(5)
+    ]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/shipper/my-services", params=params, headers=shipper)
+        assert page.status_code == 200
+        assert len(page.json()) <= 2
+        seen += [s["id"] for s in page.json()]
+        cursor = page.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == sorted(created, reverse=True)
+
+    summary = client.get("/services/summary", params={"limit": 1})
+    assert summary.status_code == 200
+    assert set(summary.json()[0]) == {
+        "id", "title", "service_type", "origin_address", "dest_address",
+        "pickup_window_start", "offered_price", "status", "created_at",
+    }
+    assert "X-Next-Cursor" in summary.headers
+
+    near = {"near_lat": -12.55, "near_lng": -55.72, "radius_km": 10, "limit": 2}
+    parameters = []
+
+    def record(conn, cursor, statement, params, *args):
+        parameters.append(params)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        first = client.get("/services", params=near)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    # only the page, plus one row to detect the next, is loaded from the radius
+    assert max(len(params) for params in parameters) <= near["limit"] + 2
+    seen, cursor = [s["id"] for s in first.json()], first.headers["X-Next-Cursor"]
+    while cursor:
+        page = client.get("/services", params={**near, "cursor": cursor})
+        seen += [s["id"] for s in page.json()]
+        cursor = page.headers.get("X-Next-Cursor")
+    assert seen == sorted(created)
+
+    assert client.get("/services", params={"cursor": "nope"}).status_code == 400
+    bad = encode_cursor("d", "x", 2)
+    assert client.get("/services", params={**near, "cursor": bad}).status_code == 400
+
+
+def test_backhaul_batch_matches_live_suggestions():
+    shipper = reg_and_login("batchship", "batchship@x.com", "SHIPPER")
+    driver = reg_and_login("batchdrv", "batchdrv@x.com", "DRIVER")
+    other = reg_and_login("batchdrv2", "batchdrv2@x.com", "DRIVER")
+    now = datetime.utcnow()
+    window = {
+        "pickup_window_start": now.isoformat(),
+        "pickup_window_end": (now + timedelta(hours=6)).isoformat(),
+        "delivery_window_start": (now + timedelta(hours=8)).isoformat(),
+        "delivery_window_end": (now + timedelta(hours=12)).isoformat(),
+    }
+    client.post(
+        "/services",
+        headers=shipper,
+        json={
+            "title": "Campinas-SP",
+            "description": "Autopeças",
+            "service_type": "LOTACAO",
+            "origin_address": "Campinas",
+            "origin_lat": -22.91,
+            "origin_lng": -47.07,
+            "dest_address": "São Paulo",
+            "dest_lat": -23.54,
+            "dest_lng": -46.64,
+            "offered_price": 1500,
+            **window,
+        },
+    )
+    availability = {
+        "available_from": now.isoformat(),
+        "available_to": (now + timedelta(days=1)).isoformat(),
+    }
+    client.post(
+        "/drivers/intent",
+        headers=driver,
+        json={
+            "current_lat": -22.90,
+            "current_lng": -47.06,
+            "intended_dest_lat": -23.55,
+            "intended_dest_lng": -46.63,
+            "intended_dest_address": "São Paulo",
+            **availability,
+        },
+    )
+    client.post(
+        "/drivers/intent",
+        headers=other,
+        json={
+            "current_lat": -8.05,
+            "current_lng": -34.88,
+            "intended_dest_lat": -5.79,
+            "intended_dest_lng": -35.21,
+            "intended_dest_address": "Natal",
+            **availability,
+        },
+    )
+    with TestingSessionLocal() as db:
+        result = run_backhaul_batch(db, radius_km=300, workers=2)
+    # intents left by other tests are matched too
+    assert result.drivers >= 2
+    assert result.shards >= 2
+
+    driver_id = client.get("/me", headers=driver).json()["id"]
+    live = client.get(
+        f"/drivers/{driver_id}/backhaul_suggestions",
+        params={
+            "from_lat": -22.90,
+            "from_lng": -47.06,
+            "intended_dest_lat": -23.55,
+            "intended_dest_lng": -46.63,
+            "radius_km": 300,
+        },
+    ).json()
+    pre = client.get(f"/drivers/{driver_id}/backhaul_suggestions/precomputed", headers=driver)
+    assert pre.status_code == 200
+    assert live
+    assert pre.json() == live
+    other_id = client.get("/me", headers=other).json()["id"]
+    forbidden = client.get(f"/drivers/{other_id}/backhaul_suggestions/precomputed", headers=driver)
+    assert forbidden.status_code == 403
+
+
+def test_backhaul_cache_invalidated_by_nearby_service():
+    shipper = reg_and_login("bhship", "bhship@x.com", "SHIPPER")
+    driver = reg_and_login("bhdrv", "bhdrv@x.com", "DRIVER")
+    params = {
+        "from_lat": -19.92,
+        "from_lng": -43.94,
+        "intended_dest_lat": -23.55,
+        "intended_dest_lng": -46.63,
+        "radius_km": 100,
+    }
+    for name in ("from_lat", "intended_dest_lng"):
+        for bad in ("nan", "inf"):
+            r = client.get("/drivers/99/backhaul_suggestions", params={**params, name: bad})
+            assert r.status_code == 422
+    assert client.get("/drivers/99/backhaul_suggestions", params=params).json() == []
+    before = client.get("/internal/cache/stats", headers=INTERNAL).json()["backhaul"]
+    assert client.get("/drivers/99/backhaul_suggestions", params=params).json() == []
+    after = client.get("/internal/cache/stats", headers=INTERNAL).json()["backhaul"]
+    assert after["hits"] == before["hits"] + 1
+
+    now = datetime.utcnow()
+    payload = {
+        "title": "BH-SP",
+        "description": "Minério",
+        "service_type": "GRANEL",
+        "origin_address": "Belo Horizonte",
+        "origin_lat": -19.93,
+        "origin_lng": -43.95,
+        "dest_address": "São Paulo",
+        "dest_lat": -23.55,
+        "dest_lng": -46.63,
+        "pickup_window_start": now.isoformat(),
+        "pickup_window_end": (now + timedelta(hours=2)).isoformat(),
+        "delivery_window_start": (now + timedelta(hours=10)).isoformat(),
+        "delivery_window_end": (now + timedelta(hours=20)).isoformat(),
+        "offered_price": 5000,
+    }
+    svc = client.post("/services", headers=shipper, json=payload).json()
+    sug = client.get("/drivers/99/backhaul_suggestions", params=params).json()
+    assert [s["service_id"] for s in sug] == [svc["id"]]
+
+    # leaving PUBLICADO invalidates; edits while in negotiation can't change suggestions
+    other = client.post("/services", headers=shipper, json={**payload, "title": "BH-RJ"}).json()
+    offer = {"kind": "COUNTER", "price": 5200}
+    client.post(f"/services/{other['id']}/offers", headers=driver, json=offer)
+    sug = client.get("/drivers/99/backhaul_suggestions", params=params).json()
+    assert [s["service_id"] for s in sug] == [svc["id"]]
+    before = client.get("/internal/cache/stats", headers=INTERNAL).json()["backhaul"]
+    client.patch(f"/services/{other['id']}", headers=shipper, json={"offered_price": 5100})
+    assert client.get("/drivers/99/backhaul_suggestions", params=params).json() == sug
+    after = client.get("/internal/cache/stats", headers=INTERNAL).json()["backhaul"]
+    assert after["hits"] == before["hits"] + 1
+
+
+def test_backhaul_loads_index_hits_in_bounded_batches():
+    shipper = reg_and_login("bhbatch", "bhbatch@x.com", "SHIPPER")
+    now = datetime.utcnow()
+    payload = {
+        "description": "Soja",
+        "service_type": "GRANEL",
+        "origin_address": "Goiânia",
+        "origin_lat": -16.68,
+        "origin_lng": -49.25,
+        "dest_address": "Brasília",
+        "dest_lat": -15.79,
+        "dest_lng": -47.88,
+        "pickup_window_start": now.isoformat(),
+        "pickup_window_end": (now + timedelta(hours=4)).isoformat(),
+        "delivery_window_start": (now + timedelta(hours=8)).isoformat(),
+        "delivery_window_end": (now + timedelta(hours=12)).isoformat(),
+        "offered_price": 3000,
+    }
+    ids = {
+        client.post("/services", headers=shipper, json={**payload, "title": f"GYN-BSB {i}"})
+        .json()["id"]
+        for i in range(5)
+    }
+    parameters = []
+
+    def record(conn, cursor, statement, params, *args):
+        parameters.append(params)
+
+    search._IDS_PER_QUERY = 2
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        sug = client.get(
+            "/drivers/98/backhaul_suggestions",
+            params={
+                "from_lat": -16.68,
+                "from_lng": -49.25,
+                "intended_dest_lat": -15.79,
+                "intended_dest_lng": -47.88,
+                "radius_km": 20,
+            },
+        ).json()
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+        search._IDS_PER_QUERY = 1000
+    assert {s["service_id"] for s in sug} == ids
+    # two ids and the status per statement
+    assert max(len(params) for params in parameters) <= 3
+
+
+def test_backhaul_only_suggests_loads_reachable_within_pickup_window():
+    shipper = reg_and_login("winship", "winship@x.com", "SHIPPER")
+    driver = reg_and_login("win", "win@x.com", "DRIVER")
+    driver_id = client.get("/me", headers=driver).json()["id"]
+    now = datetime.utcnow()
+    intent = {
+        "current_lat": -30.03,
+        "current_lng": -51.23,
+        "intended_dest_lat": -25.43,
+        "intended_dest_lng": -49.27,
+        "intended_dest_address": "Curitiba",
+        "available_from": now.isoformat(),
+        "available_to": (now + timedelta(days=1)).isoformat(),
+    }
+    client.post("/drivers/intent", headers=driver, json=intent)
+    base = {
+        "description": "Grãos",
+        "service_type": "LOTACAO",
+        "origin_address": "Porto Alegre",
+        "origin_lat": -30.04,
+        "origin_lng": -51.22,
+        "dest_address": "Curitiba",
+        "dest_lat": -25.43,
+        "dest_lng": -49.27,
+        "delivery_window_start": (now + timedelta(days=4)).isoformat(),
+        "delivery_window_end": (now + timedelta(days=5)).isoformat(),
+        "offered_price": 4000,
+    }
+    windows = {
+        "open": (now, now + timedelta(hours=3), {}),
+        "closed": (now - timedelta(hours=5), now - timedelta(hours=1), {}),
+        "too-late": (now + timedelta(days=3), now + timedelta(days=3, hours=6), {}),
+        # ~95 km away with 30 minutes left
+        "too-far": (now, now + timedelta(minutes=30), {"origin_lat": -29.18}),
+    }
+    ids = {}
+    for title, (start, end, extra) in windows.items():
+        payload = {
+            **base,
+            "title": title,
+            "pickup_window_start": start.isoformat(),
+            "pickup_window_end": end.isoformat(),
+            **extra,
+        }
+        ids[title] = client.post("/services", json=payload, headers=shipper).json()["id"]
+
+    url = f"/drivers/{driver_id}/backhaul_suggestions"
+    params = {
+        "from_lat": -30.03,
+        "from_lng": -51.23,
+        "intended_dest_lat": -25.43,
+        "intended_dest_lng": -49.27,
+        "radius_km": 150,
+    }
+    sug = client.get(url, params=params).json()
+    assert [s["service_id"] for s in sug] == [ids["open"]]
+
+    # an intent that ran out falls back to the default horizon rather than matching nothing
+    client.post(
+        "/drivers/intent",
+        headers=driver,
+        json={
+            **intent,
+            "available_from": (now - timedelta(days=2)).isoformat(),
+            "available_to": (now - timedelta(days=1)).isoformat(),
+        },
+    )
+    sug = client.get(url, params=params).json()
+    assert [s["service_id"] for s in sug] == [ids["open"]]
+
+
+def test_authenticated_requests_skip_user_load_and_honour_revocation():
+    headers = reg_and_login("rev", "rev@x.com", "DRIVER")
+    assert client.get("/me", headers=headers).status_code == 200
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        me = client.get("/me", headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert me.json()["email"] == "rev@x.com"
+    assert statements == []
+
+    assert client.post("/auth/logout-all", headers=headers).status_code == 200
+    revoked = client.get("/me", headers=headers)
+    assert revoked.status_code == 401
+    assert client.get("/me", headers=login("rev@x.com")).status_code == 200
+
+
+def test_metrics_report_route_latency_and_sql_per_request():
+    headers = reg_and_login("met", "met@x.com", "SHIPPER")
+    assert client.get("/services/999999", headers=headers).status_code == 404
+    client.get("/services/999999")
+    client.get("/no-such-route")
+
+    body = client.get("/metrics", headers=INTERNAL).text
+    labels = 'method="GET",route="/services/{service_id}",status="404"'
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in body
+    assert f"http_request_duration_seconds_count{{{labels}}} 2" in body
+    assert f"http_request_db_queries_total{{{labels}}} 2" in body
+    assert 'route="unmatched",status="404"' in body
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/internal/db/pool", headers=headers).status_code == 401
+    assert client.get("/internal/db/pool", headers=INTERNAL).status_code == 200
+    settings.internal_token = None
+    try:
+        assert client.get("/metrics", headers=INTERNAL).status_code == 404
+    finally:
+        settings.internal_token = "interno"
+
+
+def test_metrics_leave_untimed_streams_out_of_the_histograms():
+    metrics = RequestMetrics()
+
+    async def endpoint(scope, receive, send):
+        scope["route"] = SimpleNamespace(path=scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = MetricsMiddleware(endpoint, metrics, untimed=frozenset({"/services/stream"}))
+    for path in ("/services/stream", "/services"):
+        asyncio.run(middleware({"type": "http", "method": "GET", "path": path}, None, send))
+    assert [route for _, route, _ in metrics.series] == ["/services"]
+
+
+def test_concurrent_accepts_have_exactly_one_winner():
+    shipper = reg_and_login("race", "race@x.com", "SHIPPER")
+    now = datetime.utcnow()
+    sid = client.post(
+        "/services",
+        headers=shipper,
+        json={
+            "title": "Carga disputada",
+            "description": "Paletes",
+            "service_type": "LOTACAO",
+            "origin_address": "Goiânia",
+            "origin_lat": -16.68,
+            "origin_lng": -49.25,
+            "dest_address": "Brasília",
+            "dest_lat": -15.79,
+            "dest_lng": -47.88,
+            "pickup_window_start": now.isoformat(),
+            "pickup_window_end": (now + timedelta(hours=2)).isoformat(),
+            "delivery_window_start": (now + timedelta(hours=3)).isoformat(),
+            "delivery_window_end": (now + timedelta(hours=8)).isoformat(),
+            "offered_price": 1200,
+        },
+    ).json()["id"]
+    offer_ids = []
+    for i in range(8):
+        driver = reg_and_login(f"racer{i}", f"racer{i}@x.com", "DRIVER")
+        offer = client.post(
+            f"/services/{sid}/offers", headers=driver, json={"kind": "COUNTER", "price": 1300 + i}
+        )
+        offer_ids.append(offer.json()["id"])
+
+    def accept(offer_id):
+        return client.post(f"/offers/{offer_id}/accept", headers=shipper)
+
+    with ThreadPoolExecutor(max_workers=len(offer_ids)) as pool:
+        responses = list(pool.map(accept, offer_ids))
+
+    codes = sorted(r.status_code for r in responses)
+    assert codes == [200] + [409] * (len(offer_ids) - 1)
+    winner = next(r.json() for r in responses if r.status_code == 200)
+    assert winner["status"] == "ACCEPTED"
+    assert {r.json()["detail"] for r in responses if r.status_code == 409} == {
+        "Serviço já atribuído"
+    }
+
+    offers = client.get(f"/services/{sid}/offers", headers=shipper).json()
+    assert sorted(o["status"] for o in offers) == ["ACCEPTED"] + ["REJECTED"] * 7
+    assert client.get(f"/services/{sid}").json()["status"] == "ACEITO"
+
+    again = accept(winner["id"])
+    assert again.status_code == 200
+    assert again.json()["status"] == "ACCEPTED"
+
+
+def test_service_mutations_feed_live_subscribers_in_the_area():
+    shipper = reg_and_login("feed", "feed@x.com", "SHIPPER")
+    driver = reg_and_login("feedd", "feedd@x.com", "DRIVER")
+    near = service_feed.subscribe(-3.73, -38.52, 50)
+    far = service_feed.subscribe(-30.03, -51.23, 50)
+    now = datetime.utcnow()
+    payload = {
+        "title": "Fortaleza-Sobral",
+        "description": "Sacaria",
+        "service_type": "LOTACAO",
+        "origin_address": "Fortaleza",
+        "origin_lat": -3.72,
+        "origin_lng": -38.54,
+        "dest_address": "Sobral",
+        "dest_lat": -3.69,
+        "dest_lng": -40.35,
+        "pickup_window_start": now.isoformat(),
+        "pickup_window_end": (now + timedelta(hours=2)).isoformat(),
+        "delivery_window_start": (now + timedelta(hours=3)).isoformat(),
+        "delivery_window_end": (now + timedelta(hours=8)).isoformat(),
+        "offered_price": 700,
+    }
+    try:
+        sid = client.post("/services", headers=shipper, json=payload).json()["id"]
+        client.patch(f"/services/{sid}", headers=shipper, json={"offered_price": 750})
+        offer = {"kind": "COUNTER", "price": 800}
+        offer_id = client.post(f"/services/{sid}/offers", headers=driver, json=offer).json()["id"]
+        # no longer open: later transitions stay out of the feed
+        client.patch(f"/services/{sid}", headers=shipper, json={"offered_price": 780})
+        client.post(f"/offers/{offer_id}/accept", headers=shipper)
+        client.post(f"/assignments/{sid}/collect", headers=driver)
+        client.post(f"/assignments/{sid}/deliver", headers=driver)
+        direct = client.post("/services", headers=shipper, json=payload).json()["id"]
+        accept = {"kind": "ACCEPT", "price": 700}
+        client.post(f"/services/{direct}/offers", headers=driver, json=accept)
+
+        frames = [near.queue.get_nowait() for _ in range(near.queue.qsize())]
+        assert [f.split("\n")[0] for f in frames] == [
+            "event: published",
+            "event: changed",
+            "event: withdrawn",
+            "event: published",
+            "event: withdrawn",
+        ]
+        assert f'"id": {sid}' in frames[0]
+        assert f'"id": {direct}' in frames[4]
+        assert far.queue.empty()
+    finally:
+        service_feed.unsubscribe(near)
+        service_feed.unsubscribe(far)
+
+
+def test_service_stream_sends_events_and_unsubscribes_on_close():
+    async def scenario():
+        response = await stream_services(near_lat=-15.79, near_lng=-47.88, radius_km=30)
+        frames = response.body_iterator
+        assert await frames.__anext__() == ": subscribed\n\n"
+        service_feed.publish("published", -15.80, -47.90, {"id": 42})
+        assert await frames.__anext__() == 'event: published\ndata: {"id": 42}\n\n'
+        await frames.aclose()
+
+    before = service_feed.stats()["subscribers"]
+    asyncio.run(scenario())
+    assert service_feed.stats()["subscribers"] == before
+
+
+def test_service_etag_and_cached_lists_answer_304():
+    shipper = reg_and_login("etag", "etag@x.com", "SHIPPER")
+    driver = reg_and_login("etagd", "etagd@x.com", "DRIVER")
+    now = datetime.utcnow()
+    sid = client.post(
+        "/services",
+        headers=shipper,
+        json={
+            "title": "Manaus-Belém",
+            "description": "Eletrônicos",
+            "service_type": "LOTACAO",
+            "origin_address": "Manaus",
+            "origin_lat": -3.12,
+            "origin_lng": -60.02,
+            "dest_address": "Belém",
+            "dest_lat": -1.46,
+            "dest_lng": -48.50,
+            "pickup_window_start": now.isoformat(),
+            "pickup_window_end": (now + timedelta(hours=2)).isoformat(),
+            "delivery_window_start": (now + timedelta(hours=3)).isoformat(),
+            "delivery_window_end": (now + timedelta(hours=8)).isoformat(),
+            "offered_price": 5000,
+        },
+    ).json()["id"]
+
+    first = client.get(f"/services/{sid}")
+    etag = first.headers["ETag"]
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        cached = client.get(f"/services/{sid}", headers={"If-None-Match": etag})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert len(statements) == 1 and "title" not in statements[0]
+
+    client.patch(f"/services/{sid}", headers=shipper, json={"offered_price": 5200})
+    changed = client.get(f"/services/{sid}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    client.post(f"/services/{sid}/offers", headers=driver, json={"kind": "COUNTER", "price": 5100})
+    bumped = client.get(f"/services/{sid}", headers={"If-None-Match": changed.headers["ETag"]})
+    assert bumped.status_code == 200
+    assert bumped.json()["status"] == "EM_NEGOCIACAO"
+
+    page = client.get("/services/summary", params={"status": "EM_NEGOCIACAO", "limit": 1})
+    again = client.get(
+        "/services/summary",
+        params={"status": "EM_NEGOCIACAO", "limit": 1},
+        headers={"If-None-Match": page.headers["ETag"]},
+    )
+    assert again.status_code == 304
+    client.patch(f"/services/{sid}", headers=shipper, json={"title": "Manaus-Belém (urgente)"})
+    fresh = client.get(
+        "/services/summary",
+        params={"status": "EM_NEGOCIACAO", "limit": 1},
+        headers={"If-None-Match": page.headers["ETag"]},
+    )
+    assert fresh.status_code == 200
+    assert fresh.json()[0]["title"] == "Manaus-Belém (urgente)"
+
+
+def test_fast_list_serialization_returns_identical_payloads():
+    shipper = reg_and_login("fast", "fast@x.com", "SHIPPER")
+    driver = reg_and_login("fastd", "fastd@x.com", "DRIVER")
+    now = datetime.utcnow()
+    base = {
+        "description": "Bobinas",
+        "service_type": "LOTACAO",
+        "origin_address": "Joinville",
+        "origin_lat": -26.30,
+        "origin_lng": -48.85,
+        "dest_address": "Curitiba",
+        "dest_lat": -25.43,
+        "dest_lng": -49.27,
+        "pickup_window_start": now.isoformat(),
+        "pickup_window_end": (now + timedelta(hours=2)).isoformat(),
+        "delivery_window_start": (now + timedelta(hours=3)).isoformat(),
+        "delivery_window_end": (now + timedelta(hours=8)).isoformat(),
+        "offered_price": 1234.56,
+    }
+    ids = [
+        client.post("/services", headers=shipper, json={**base, "title": f"JOI-CWB {i}"})
+        .json()["id"]
+        for i in range(3)
+    ]
+    offer = {"kind": "COUNTER", "price": 1300}
+    client.post(f"/services/{ids[0]}/offers", headers=driver, json=offer)
+
+    requests = [
+        ("/shipper/my-services", {"limit": 2}, shipper),
+        (f"/services/{ids[0]}/offers", {}, shipper),
+        ("/services", {"status": "PUBLICADO", "limit": 2}, None),
+        ("/services", {"near_lat": -26.3, "near_lng": -48.85, "radius_km": 10}, None),
+    ]
+
+    def snapshot():
+        list_cache.invalidate()
+        responses = [client.get(path, params=params, headers=h) for path, params, h in requests]
+        return [(r.status_code, r.json(), r.headers.get("X-Next-Cursor")) for r in responses]
+
+    standard = snapshot()
+    settings.fast_list_serialization = True
+    try:
+        fast = snapshot()
+    finally:
+        settings.fast_list_serialization = False
+    assert fast == standard
+    assert all(code == 200 for code, _, _ in standard)
+
+
+def test_bulk_upload_inserts_valid_rows_in_chunks_and_reports_bad_lines():
+    shipper = reg_and_login("bulk", "bulk@x.com", "SHIPPER")
+    now = datetime.utcnow()
+    columns = [
+        "title", "description", "service_type", "origin_address", "origin_lat", "origin_lng",
+        "dest_address", "dest_lat", "dest_lng", "pickup_window_start", "pickup_window_end",
+        "delivery_window_start", "delivery_window_end", "offered_price",
+    ]
+    windows = [now + timedelta(hours=h) for h in (1, 3, 5, 9)]
+
+    def csv_row(title, origin_lat="-20.32", description="Minério"):
+        values = [
+            title, description, "LOTACAO", "Vitória", origin_lat, "-40.34", "Belo Horizonte",
+            "-19.92", "-43.94", *(w.isoformat() for w in windows), "2100.50",
+        ]
+        return ",".join(values)
+
+    body = "\n".join(
+        [
+            ",".join(columns),
+            csv_row("VIX-BH 1"),
+            csv_row("VIX-BH 2", origin_lat="norte"),
+            csv_row("VIX-BH 3", description='"Chapas, bobinas\ne perfis"'),
+            csv_row("VIX-BH 4"),
+            "curta,demais",
+            csv_row("VIX-BH 5"),
+        ]
+    )
+    settings.bulk_chunk_size = 2
+    try:
+        r = client.post(
+            "/services/bulk", headers={**shipper, "Content-Type": "text/csv"}, content=body
+        )
+    finally:
+        settings.bulk_chunk_size = 500
+    assert r.status_code == 200
+    result = r.json()
+    assert (result["received"], result["created"], result["failed"]) == (6, 4, 2)
+    assert [e["line"] for e in result["errors"]] == [3, 7]
+    assert result["errors"][0]["errors"][0]["loc"] == ["origin_lat"]
+
+    mine = client.get("/shipper/my-services", headers=shipper).json()
+    assert sorted(s["title"] for s in mine) == ["VIX-BH 1", "VIX-BH 3", "VIX-BH 4", "VIX-BH 5"]
+    assert next(s for s in mine if s["title"] == "VIX-BH 3")["description"] == (
+        "Chapas, bobinas\ne perfis"
+    )
+    near = client.get("/services", params={"near_lat": -20.32, "near_lng": -40.34, "radius_km": 5})
+    assert len(near.json()) == 4
+
+    ndjson_headers = {**shipper, "Content-Type": "application/x-ndjson"}
+    r = client.post("/services/bulk", headers=ndjson_headers, content='{"title": "x"}\n')
+    assert r.json()["failed"] == 1 and r.json()["created"] == 0
+    wrong_type = client.post(
+        "/services/bulk", headers={**shipper, "Content-Type": "application/json"}, content="[]"
+    )
+    assert wrong_type.status_code == 415
+
+
+def test_bulk_upload_reports_rows_stored_before_an_unreadable_chunk():
+    shipper = reg_and_login("bulkstream", "bulkstream@x.com", "SHIPPER")
+    now = datetime.utcnow()
+    row = {
+        "description": "Celulose",
+        "service_type": "LOTACAO",
+        "origin_address": "Três Lagoas",
+        "origin_lat": -20.79,
+        "origin_lng": -51.70,
+        "dest_address": "Santos",
+        "dest_lat": -23.96,
+        "dest_lng": -46.33,
+        "pickup_window_start": (now + timedelta(hours=1)).isoformat(),
+        "pickup_window_end": (now + timedelta(hours=3)).isoformat(),
+        "delivery_window_start": (now + timedelta(hours=12)).isoformat(),
+        "delivery_window_end": (now + timedelta(hours=18)).isoformat(),
+        "offered_price": 6500,
+    }
+
+    async def body():
+        for i in range(3):
+            yield (json.dumps({**row, "title": f"TLS-SSZ {i}"}) + "\n").encode()
+        yield b"\xff\xfe\n"
+        yield (json.dumps({**row, "title": "TLS-SSZ depois"}) + "\n").encode()
+
+    async def upload():
+        # TestClient buffers the whole body; ASGITransport sends each chunk as it comes
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post(
+                "/services/bulk",
+                headers={**shipper, "Content-Type": "application/x-ndjson"},
+                content=body(),
+            )
+
+    settings.bulk_chunk_size = 2
+    try:
+        r = asyncio.run(upload())
+    finally:
+        settings.bulk_chunk_size = 500
+    assert r.status_code == 200
+    result = r.json()
+    assert (result["received"], result["created"], result["failed"]) == (3, 3, 0)
+    assert result["error"].startswith("Upload inválido")
+    mine = client.get("/shipper/my-services", headers=shipper).json()
+    assert sorted(s["title"] for s in mine) == ["TLS-SSZ 0", "TLS-SSZ 1", "TLS-SSZ 2"]
+
+
+def test_change_feed_returns_only_services_changed_since_cursor():
+    shipper = reg_and_login("delta", "delta@x.com", "SHIPPER")
+    driver = reg_and_login("deltad", "deltad@x.com", "DRIVER")
+    head = client.get("/services/changes", params={"since": 0, "limit": 5000}).json()
+    while head["more"]:
+        head = client.get("/services/changes", params={"since": head["next"]}).json()
+    now = datetime.utcnow()
+    payload = {
+        "description": "Grãos",
+        "service_type": "LOTACAO",
+        "origin_address": "Sorriso",
+        "origin_lat": -12.55,
+        "origin_lng": -55.72,
+        "dest_address": "Paranaguá",
+        "dest_lat": -25.52,
+        "dest_lng": -48.51,
+        "pickup_window_start": now.isoformat(),
+        "pickup_window_end": (now + timedelta(hours=2)).isoformat(),
+        "delivery_window_start": (now + timedelta(days=2)).isoformat(),
+        "delivery_window_end": (now + timedelta(days=3)).isoformat(),
+        "offered_price": 14000,
+    }
+    sid = client.post("/services", headers=shipper, json={"title": "Soja", **payload}).json()["id"]
+    other = client.post("/services", headers=shipper, json={"title": "Milho", **payload}).json()
+    client.patch(f"/services/{sid}", headers=shipper, json={"offered_price": 14500})
+
+    delta = client.get("/services/changes", params={"since": head["next"]}).json()
+    assert [c["id"] for c in delta["changes"]] == [other["id"], sid]
+    assert delta["changes"][1]["offered_price"] == 14500
+    assert delta["changes"][1]["version"] == 2
+    assert delta["more"] is False
+    assert client.get("/services/changes", params={"since": delta["next"]}).json() == {
+        "next": delta["next"],
+        "more": False,
+        "pending": False,
+        "changes": [],
+    }
+
+    client.post(f"/services/{sid}/offers", headers=driver, json={"kind": "ACCEPT", "price": 14500})
+    client.post(f"/assignments/{sid}/collect", headers=driver)
+    accepted = client.get("/services/changes", params={"since": delta["next"]}).json()
+    assert [(c["id"], c["status"]) for c in accepted["changes"]] == [(sid, "COLETADO")]
+    assert accepted["next"] == delta["next"] + 3
+
+    # an unfinished sequence number holds the cursor back until it settles
+    with TestingSessionLocal() as db:
+        db.add(ServiceChange(seq=accepted["next"] + 2, service_id=sid))
+        db.commit()
+    held = client.get("/services/changes", params={"since": accepted["next"]})
+    assert held.json() == {"next": accepted["next"], "more": False, "pending": True, "changes": []}
+    assert held.headers["Retry-After"] == "2"
+    with TestingSessionLocal() as db:
+        db.get(ServiceChange, accepted["next"] + 2).changed_at = now - timedelta(minutes=1)
+        db.commit()
+    settled = client.get("/services/changes", params={"since": accepted["next"]}).json()
+    assert settled["next"] == accepted["next"] + 2
+    assert [c["id"] for c in settled["changes"]] == [sid]
@@ -0,0 +1,38 @@
+import json
+from argparse import Namespace
+
+from benchmarks import suite
+
+
+def test_suite_writes_comparable_results(tmp_path):
+    output = tmp_path / "run.json"
+    args = Namespace(
+        database_url=None,
+        size="10k",
+        services=300,
+        modes=["inprocess"],
+        base_url=None,
+        scenarios=["list_services_radius", "backhaul", "offer_create", "offer_accept"],
+        requests=10,
+        login_requests=0,
+        concurrency=2,
+        seed=7,
+        output=str(output),
+        baseline=None,
+        max_regression=0.2,
+        keep=False,
+    )
+    assert suite.run(args) == 0
+    report = json.loads(output.read_text())
+    assert report["meta"]["services"] == 300
+    results = report["results"]["inprocess"]
+    assert set(results) == set(args.scenarios)
+    for result in results.values():
+        assert result["requests"] == 10
+        assert result["errors"] == 0, result["status_codes"]
+
+    baseline = json.loads(output.read_text())
+    baseline["results"]["inprocess"]["backhaul"]["p95_ms"] = 1e-6
+    assert suite.compare(report, baseline, 0.2) == [
+        f"inprocess/backhaul: p95 0.00 -> {results['backhaul']['p95_ms']:.2f} ms"
+    ]
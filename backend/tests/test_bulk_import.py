@@ -0,0 +1,45 @@
+import asyncio
+
+from pydantic import BaseModel
+
+from app.services.bulk_import import RowError, upload_format, validated_rows
+
+
+class Row(BaseModel):
+    name: str
+    weight: float
+
+
+async def _collect(body: bytes, fmt: str, size: int = 7):
+    async def chunks():
+        for i in range(0, len(body), size):
+            yield body[i : i + size]
+
+    return [item async for item in validated_rows(chunks(), fmt, Row)]
+
+
+def test_csv_rows_survive_chunk_boundaries_and_quoted_newlines():
+    body = (
+        'name,weight\r\n"Soja, grão",12.5\r\n"Milho\nensacado",8\r\n'
+        "Algodão,pesado\r\n\r\nCafé,3\r\n"
+    ).encode()
+    rows = asyncio.run(_collect(body, "csv"))
+    assert [line for line, _ in rows] == [2, 3, 5, 7]
+    assert rows[0][1] == Row(name="Soja, grão", weight=12.5)
+    assert rows[1][1].name == "Milho\nensacado"
+    assert isinstance(rows[2][1], RowError)
+    assert rows[2][1].errors[0]["loc"] == ["weight"]
+    assert rows[3][1] == Row(name="Café", weight=3)
+
+
+def test_ndjson_reports_bad_lines_and_keeps_going():
+    body = b'{"name": "a", "weight": 1}\n{oops\n[1]\n{"name": "b", "weight": 2}'
+    rows = asyncio.run(_collect(body, "ndjson", size=5))
+    assert [(line, type(row).__name__) for line, row in rows] == [
+        (1, "Row"),
+        (2, "RowError"),
+        (3, "RowError"),
+        (4, "Row"),
+    ]
+    assert upload_format("text/csv; charset=utf-8") == "csv"
+    assert upload_format("application/json") is None
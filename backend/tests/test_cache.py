@@ -0,0 +1,31 @@
+import time
+
+from app.services.cache import TTLCache
+
+
+def test_ttl_cache_lru_eviction_and_stats():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_ttl_cache_expiry_and_invalidation():
+    cache = TTLCache(max_entries=10, ttl_seconds=0.01)
+    cache.set(1, "x")
+    time.sleep(0.02)
+    assert cache.get(1) is None
+    assert cache.stats()["expirations"] == 1
+
+    cache.ttl_seconds = 60
+    for k in range(5):
+        cache.set(k, k)
+    assert cache.invalidate_where(lambda k: k % 2 == 0) == 3
+    assert len(cache) == 2
@@ -0,0 +1,67 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base
+from app.models.models import Offer, OfferKind, Service, User, UserRole
+from app.services.export import export_table
+
+
+def test_export_streams_rows_with_since_filter_and_gzip(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(engine)
+    old = datetime(2024, 1, 1)
+    new = datetime(2024, 11, 1, 10, 0)
+    with sessionmaker(bind=engine)() as db:
+        user = User(name="x", email="x@example.com", password_hash="-", role=UserRole.SHIPPER)
+        db.add(user)
+        db.flush()
+        for i, created_at in enumerate([old, new, new + timedelta(hours=1)]):
+            db.add(
+                Service(
+                    created_by_user_id=user.id,
+                    title=f"Carga {i}",
+                    description="Açúcar, ensacado",
+                    service_type="LOTACAO",
+                    origin_address="Ribeirão Preto",
+                    origin_lat=-21.18,
+                    origin_lng=-47.81,
+                    dest_address="Santos",
+                    dest_lat=-23.96,
+                    dest_lng=-46.33,
+                    pickup_window_start=created_at,
+                    pickup_window_end=created_at,
+                    delivery_window_start=created_at,
+                    delivery_window_end=created_at,
+                    offered_price=3200.75,
+                    created_at=created_at,
+                )
+            )
+        db.flush()
+        db.add(Offer(service_id=1, driver_user_id=user.id, kind=OfferKind.COUNTER, price=3000))
+        db.commit()
+
+        out = io.StringIO()
+        assert export_table(db, "services", out, since=new, batch_size=1) == 2
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r["title"] for r in rows] == ["Carga 1", "Carga 2"]
+        assert rows[0]["offered_price"] == 3200.75
+        assert rows[0]["status"] == "PUBLICADO"
+        assert rows[0]["created_at"] == "2024-11-01T10:00:00"
+
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode="wb") as gz:
+            text = io.TextIOWrapper(gz, encoding="utf-8", newline="")
+            assert export_table(db, "offers", text, fmt="csv") == 1
+            text.flush()
+            text.detach()
+        lines = gzip.decompress(buffer.getvalue()).decode().splitlines()
+        header, offer = list(csv.reader(lines))
+        assert dict(zip(header, offer))["kind"] == "COUNTER"
+        assert export_table(db, "assignments", io.StringIO()) == 0
+    engine.dispose()
@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+
+from app.models.models import Offer, OfferKind, OfferStatus, Service, ServiceStatus
+from app.schemas.schemas import OfferOut, ServiceOut
+from app.services.fast_json import RowEncoder
+
+
+def test_row_encoder_matches_pydantic_output():
+    now = datetime(2024, 11, 1, 8, 30, 15, 123456)
+    services = [
+        Service(
+            id=i,
+            created_by_user_id=7,
+            title=f"Carga {i}",
+            description="Grãos",
+            service_type="LOTACAO",
+            origin_address="Sorriso",
+            origin_lat=-12.54,
+            origin_lng=-55.71,
+            dest_address="Santos",
+            dest_lat=-23.96,
+            dest_lng=-46.33,
+            pickup_window_start=now,
+            pickup_window_end=now,
+            delivery_window_start=now,
+            delivery_window_end=now,
+            offered_price=Decimal("12500.50"),
+            status=ServiceStatus.PUBLICADO,
+        )
+        for i in range(3)
+    ]
+    expected = TypeAdapter(list[ServiceOut]).dump_json(
+        TypeAdapter(list[ServiceOut]).validate_python(services, from_attributes=True)
+    )
+    encoder = RowEncoder(ServiceOut)
+    assert json.loads(encoder.encode(encoder.rows_from(services))) == json.loads(expected)
+
+    offer = Offer(
+        id=1,
+        service_id=2,
+        driver_user_id=3,
+        kind=OfferKind.COUNTER,
+        price=Decimal("99.90"),
+        message=None,
+        status=OfferStatus.PENDING,
+    )
+    row = RowEncoder(OfferOut).rows_from([offer])[0] + ("ignored cursor column",)
+    assert json.loads(RowEncoder(OfferOut).encode([row])) == [
+        OfferOut.model_validate(offer).model_dump(mode="json")
+    ]
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+
+from app.services.geo import (
+    bounding_box,
+    equirectangular_km_many,
+    haversine_km,
+    haversine_km_many,
+    haversine_km_pairwise,
+    within_radius_mask,
+)
+
+# Vectorized results must match the scalar reference to within a millimetre.
+TOLERANCE_KM = 1e-6
+
+
+def _points(n, seed=1):
+    rng = random.Random(seed)
+    return [(rng.uniform(-33.7, 5.2), rng.uniform(-73.9, -34.8)) for _ in range(n)]
+
+
+def test_many_matches_scalar_reference():
+    pts = _points(500)
+    lats, lngs = [p[0] for p in pts], [p[1] for p in pts]
+    got = haversine_km_many(-23.55, -46.63, lats, lngs)
+    expected = [haversine_km(-23.55, -46.63, lat, lng) for lat, lng in pts]
+    assert np.allclose(got, expected, rtol=0, atol=TOLERANCE_KM)
+
+
+def test_pairwise_matches_scalar_reference():
+    a, b = _points(500, seed=2), _points(500, seed=3)
+    a_lats, a_lngs = [p[0] for p in a], [p[1] for p in a]
+    got = haversine_km_pairwise(a_lats, a_lngs, [q[0] for q in b], [q[1] for q in b])
+    expected = [haversine_km(p[0], p[1], q[0], q[1]) for p, q in zip(a, b)]
+    assert np.allclose(got, expected, rtol=0, atol=TOLERANCE_KM)
+
+
+def test_equirectangular_prefilter_keeps_every_point_in_radius():
+    pts = _points(5000, seed=4)
+    lats, lngs = np.array([p[0] for p in pts]), np.array([p[1] for p in pts])
+    exact = haversine_km_many(-15.8, -47.9, lats, lngs)
+    approx = equirectangular_km_many(-15.8, -47.9, lats, lngs)
+    close = exact <= 500
+    assert np.all(np.abs(approx[close] - exact[close]) <= exact[close] * 0.01)
+    for radius in (10, 100, 300, 1000):
+        mask = within_radius_mask(-15.8, -47.9, lats, lngs, radius)
+        assert np.all(mask[exact <= radius])
+
+
+def test_bounding_box_contains_radius():
+    for lat, lng in [(-23.55, -46.63), (-3.1, -60.0), (4.5, -51.0), (-33.5, -53.4)]:
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, 250)
+        for p_lat, p_lng in _points(5000, seed=5):
+            if haversine_km(lat, lng, p_lat, p_lng) <= 250:
+                assert min_lat <= p_lat <= max_lat
+                assert min_lng <= p_lng <= max_lng
+    assert bounding_box(89.5, 0, 200)[2:] == (-180.0, 180.0)
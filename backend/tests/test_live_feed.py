@@ -0,0 +1,34 @@
+from app.services.live_feed import RESYNC, ServiceFeed
+
+
+def test_publish_reaches_only_subscribers_covering_the_origin():
+    feed = ServiceFeed(cell_deg=1.0, max_pending=10)
+    recife = feed.subscribe(-8.05, -34.88, 50)
+    sao_paulo = feed.subscribe(-23.55, -46.63, 300)
+
+    assert feed.publish("published", -8.10, -34.95, {"id": 1}) == 1
+    assert recife.queue.get_nowait() == 'event: published\ndata: {"id": 1}\n\n'
+    assert sao_paulo.queue.empty()
+
+    # Campinas is inside the São Paulo radius but in a different grid cell.
+    assert feed.publish("withdrawn", -22.90, -47.06, {"id": 2}) == 1
+    assert "withdrawn" in sao_paulo.queue.get_nowait()
+
+    feed.unsubscribe(recife)
+    feed.unsubscribe(sao_paulo)
+    assert feed.stats()["subscribers"] == 0
+    assert feed.stats()["cells"] == 0
+    assert feed.publish("published", -8.10, -34.95, {"id": 3}) == 0
+
+
+def test_slow_subscriber_is_collapsed_to_resync():
+    feed = ServiceFeed(cell_deg=1.0, max_pending=3)
+    slow = feed.subscribe(-15.79, -47.88, 20)
+    for i in range(5):
+        feed.publish("changed", -15.80, -47.90, {"id": i})
+    frames = []
+    while not slow.queue.empty():
+        frames.append(slow.queue.get_nowait())
+    assert frames[0] == RESYNC
+    assert len(frames) <= 3
+    assert slow.dropped == 3
@@ -0,0 +1,29 @@
+import random
+
+import numpy as np
+
+from app.services.matching import backhaul_scores, top_k
+
+
+def test_top_k_matches_full_sort():
+    rng = random.Random(3)
+    scores = np.array([rng.uniform(-500, 500) for _ in range(1000)])
+    assert top_k(scores, 10) == sorted(range(len(scores)), key=lambda i: -scores[i])[:10]
+    assert top_k(np.array([]), 10) == []
+
+
+def test_backhaul_scores_prefers_loads_towards_destination():
+    # Driver in Campinas heading home to São Paulo: a Campinas->SP load beats Campinas->BH.
+    scores, detours = backhaul_scores(
+        -22.90,
+        -47.06,
+        -23.55,
+        -46.63,
+        pickup_km=[1.0, 1.0],
+        trip_km=[85.0, 480.0],
+        price_per_km=[20.0, 20.0],
+        dest_lats=[-23.54, -19.92],
+        dest_lngs=[-46.64, -43.94],
+    )
+    assert top_k(scores, 1) == [0]
+    assert np.all(detours >= 0)
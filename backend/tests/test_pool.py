@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from app.core.db import async_database_url, engine_options
+from app.core.pool import InstrumentedQueuePool, pool_stats
+
+
+def test_instrumented_pool_reports_occupancy_waits_and_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    held = engine.connect()
+    stats = pool_stats(engine)
+    assert stats["checked_out"] == 1
+    assert stats["checkouts"] == 1
+
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = pool_stats(engine)
+    assert stats["timeouts"] == 1
+    assert stats["wait_ms_max"] >= 50
+
+    held.close()
+    engine.dispose()
+    engine.connect().close()
+    stats = pool_stats(engine)
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 2
+
+
+def test_engine_options_only_tune_server_pools():
+    assert "poolclass" not in engine_options("sqlite:///./x.db")
+    options = engine_options("postgresql+psycopg://u:p@db/app", use_async=True)
+    assert options["poolclass"].__name__ == "InstrumentedAsyncQueuePool"
+    assert "statement_timeout" in options["connect_args"]["options"]
+    assert async_database_url("postgresql://u:p@db/app") == "postgresql+psycopg://u:p@db/app"
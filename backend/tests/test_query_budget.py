@@ -0,0 +1,218 @@
+"""Per-endpoint SQL budgets and index usage on a seeded fixture.
+
+Every request below is sent once to warm per-process caches, then again while
+the statements reaching the driver are recorded. The test fails when an
+endpoint issues more statements than its budget, or when EXPLAIN shows a
+full scan of one of the large tables. It runs on a throwaway SQLite file, or
+on ``QUERY_BUDGET_DATABASE_URL`` (a migrated Postgres) when that is set.
+"""
+
+import json
+import os
+import random
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.db import Base, async_database_url, get_db
+from app.main import app
+from app.models.models import (
+    Assignment,
+    Offer,
+    OfferKind,
+    OfferStatus,
+    Service,
+    ServiceChange,
+    ServiceStatus,
+)
+from app.services.backhaul_cache import backhaul_cache
+from app.services.response_cache import list_cache
+from app.services.spatial_index import open_services
+from benchmarks import dataset
+
+LARGE_TABLES = {"services", "offers", "assignments", "service_changes"}
+
+# (name, method, path, auth, budget): path placeholders come from the fixture
+BUDGETS = [
+    ("feed", "GET", "/services?limit=20", None, 1),
+    ("feed_near", "GET", "/services?near_lat=-23.5&near_lng=-46.6&radius_km=50", None, 1),
+    ("summary", "GET", "/services/summary?limit=20", None, 1),
+    ("service", "GET", "/services/{service_id}", None, 1),
+    ("changes", "GET", "/services/changes?since={recent}", None, 2),
+    (
+        "backhaul",
+        "GET",
+        "/drivers/{driver_id}/backhaul_suggestions?from_lat=-22.9&from_lng=-43.2"
+        "&intended_dest_lat=-23.5&intended_dest_lng=-46.6",
+        None,
+        2,
+    ),
+    ("my_assignment", "GET", "/driver/my-assignment", "driver", 1),
+    ("my_services", "GET", "/shipper/my-services?limit=20", "shipper", 1),
+    ("offers", "GET", "/services/{offered_id}/offers", "shipper", 2),
+    ("create_offer", "POST", "/services/{service_id}/offers", "driver", 5),
+]
+
+
+@contextmanager
+def recorded_statements(engine: Engine) -> Iterator[list[tuple[str, object]]]:
+    """``(statement, parameters)`` of every cursor execute on ``engine`` inside the block."""
+    statements: list[tuple[str, object]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, None if executemany else parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def full_scans(engine: Engine, statement: str, parameters) -> list[str]:
+    """Large tables read by a full (sequential) scan in the plan of ``statement``."""
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+            nodes, scans = [plan[0]["Plan"]], []
+            while nodes:
+                node = nodes.pop()
+                nodes.extend(node.get("Plans", []))
+                if node["Node Type"] == "Seq Scan" and node["Relation Name"] in LARGE_TABLES:
+                    scans.append(node["Relation Name"])
+            return scans
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    scans = []
+    for *_, detail in rows:
+        words = detail.split()
+        if words[0] == "SCAN" and words[1] in LARGE_TABLES and "USING" not in words:
+            scans.append(words[1])
+    return scans
+
+
+def _seed_activity(engine: Engine, data: dataset.Dataset, rng: random.Random) -> dict:
+    """Offers on a few hundred services, some accepted, spread over the drivers."""
+    services = list(data.service_ids)
+    driver = data.driver_ids[0]
+    accepted = services[:400]
+    offered = services[400:800]
+    winners = [driver if i % 80 == 0 else rng.choice(data.driver_ids) for i in accepted]
+    now = datetime.utcnow()
+    offers = [
+        {
+            "service_id": service_id,
+            "driver_user_id": driver_id,
+            "kind": OfferKind.COUNTER,
+            "price": 1000,
+            "status": status,
+            "created_at": now,
+        }
+        for service_id, driver_id, status in [
+            *((s, d, OfferStatus.ACCEPTED) for s, d in zip(accepted, winners)),
+            *((s, rng.choice(data.driver_ids), OfferStatus.PENDING) for s in offered * 5),
+        ]
+    ]
+    with engine.begin() as db:
+        offer_ids = db.scalars(
+            insert(Offer).returning(Offer.id, sort_by_parameter_order=True), offers
+        ).all()
+        db.execute(
+            insert(Assignment),
+            [
+                {"service_id": s, "driver_user_id": d, "accepted_offer_id": o}
+                for s, d, o in zip(accepted, winners, offer_ids)
+            ],
+        )
+        db.execute(
+            update(Service).where(Service.id.in_(accepted)).values(status=ServiceStatus.ACEITO)
+        )
+        db.execute(
+            update(Service)
+            .where(Service.id.in_(offered))
+            .values(status=ServiceStatus.EM_NEGOCIACAO)
+        )
+        db.execute(
+            insert(ServiceChange),
+            [{"service_id": s, "changed_at": now} for s in services + accepted + offered],
+        )
+        db.execute(text("ANALYZE"))
+    return {"offered_id": offered[0], "service_id": services[-1], "driver_id": driver}
+
+
+@pytest.fixture(scope="module")
+def fixture_api(tmp_path_factory):
+    url = os.environ.get("QUERY_BUDGET_DATABASE_URL")
+    if url is None:
+        url = f"sqlite:///{tmp_path_factory.mktemp('budget') / 'budget.db'}"
+        Base.metadata.create_all(create_engine(url))
+    engine = create_engine(url)
+    data = dataset.seed(engine, 5000, 50, 200, seed=3)
+    values = _seed_activity(engine, data, random.Random(3))
+    async_engine = create_async_engine(async_database_url(url), poolclass=NullPool)
+    sessions = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def budget_db():
+        async with sessions() as db:
+            yield db
+
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = budget_db
+    for cache in (list_cache.invalidate, backhaul_cache.clear, open_services.invalidate):
+        cache()
+    client = TestClient(app)
+    with engine.connect() as conn:
+        owner = conn.scalar(
+            select(Service.created_by_user_id).where(Service.id == values["offered_id"])
+        )
+    emails = {
+        "driver": data.email("driver", 0),
+        "shipper": data.email("shipper", data.shipper_ids.index(owner)),
+    }
+    headers = {}
+    for role, email in emails.items():
+        r = client.post("/auth/login", json={"email": email, "password": dataset.PASSWORD})
+        headers[role] = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    head = client.get("/services/changes", params={"since": 0, "limit": 5000}).json()
+    values["recent"] = head["next"] - 50
+    try:
+        yield client, headers, values, async_engine.sync_engine, engine
+    finally:
+        app.dependency_overrides[get_db] = previous
+        if previous is None:
+            app.dependency_overrides.pop(get_db)
+        for cache in (list_cache.invalidate, backhaul_cache.clear, open_services.invalidate):
+            cache()
+        if "QUERY_BUDGET_DATABASE_URL" in os.environ:
+            dataset.drop(engine, data)
+        engine.dispose()
+
+
+@pytest.mark.parametrize("name, method, path, auth, budget", BUDGETS, ids=[b[0] for b in BUDGETS])
+def test_endpoint_stays_within_query_budget_without_full_scans(
+    fixture_api, name, method, path, auth, budget
+):
+    client, headers, values, app_engine, engine = fixture_api
+    kwargs = {"headers": headers[auth]} if auth else {}
+    if method == "POST":
+        kwargs["json"] = {"kind": "COUNTER", "price": 900}
+    path = path.format(**values)
+    client.request(method, path, **kwargs).raise_for_status()
+    # measure the database path, not the response caches
+    list_cache.invalidate()
+    backhaul_cache.clear()
+
+    with recorded_statements(app_engine) as statements:
+        client.request(method, path, **kwargs).raise_for_status()
+
+    listing = json.dumps([s for s, _ in statements], indent=1)
+    assert len(statements) <= budget, f"{name}: {len(statements)} statements\n{listing}"
+    for statement, parameters in statements:
+        if statement.lstrip().upper().startswith("SELECT") and parameters is not None:
+            assert not full_scans(engine, statement, parameters), f"{name}: {statement}"
@@ -0,0 +1,115 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.services.batch_matching import ServiceArrays, match_shard
+from app.services.geo import haversine_km, haversine_km_pairwise
+from app.services.matching import backhaul_scores
+from app.services.road_matrix import RoadMatrix, build_road_matrix, open_road_matrix
+from app.services.time_windows import Availability
+
+# São Paulo, Campinas, Belo Horizonte, Manaus
+HUB_LAT = [-23.55, -22.90, -19.92, -3.12]
+HUB_LNG = [-46.63, -47.06, -43.94, -60.02]
+
+
+def winding_roads(src_lat, src_lng, dst_lat, dst_lng):
+    km = 1.4 * haversine_km_pairwise(
+        src_lat[:, None], src_lng[:, None], dst_lat[None, :], dst_lng[None, :]
+    )
+    minutes = km / 70 * 60
+    manaus = np.add.outer(src_lat == -3.12, dst_lat == -3.12)
+    km[manaus] = np.nan  # no road to Manaus
+    return km, minutes
+
+
+@pytest.fixture
+def roads(tmp_path):
+    path = build_road_matrix(
+        tmp_path / "roads.bin", HUB_LAT, HUB_LNG, winding_roads, cell_deg=0.1, snap_km=40, block=3
+    )
+    return RoadMatrix(path)
+
+
+def test_points_snap_to_the_nearest_hub_within_reach(roads):
+    hubs = roads.snap([-23.60, -22.95, -21.00, -3.10, 10.0], [-46.70, -47.00, -45.50, -60.00, 0])
+    assert hubs.tolist() == [0, 1, -1, 3, -1]
+    assert isinstance(roads.km, np.memmap)
+
+
+def test_road_km_scales_straight_line_by_the_hub_pair_and_falls_back(roads):
+    sp, bh = (-23.58, -46.60), (-19.90, -43.90)
+    direct = haversine_km(*sp, *bh)
+    assert roads.km_pairwise(*sp, *bh) == pytest.approx(direct * 1.4, rel=0.01)
+    assert roads.minutes_pairwise(*sp, *bh) == pytest.approx(direct * 1.4 / 70 * 60, rel=0.01)
+    # unknown route, same hub and off-grid points keep the straight line
+    manaus = (-3.10, -60.00)
+    assert roads.km_pairwise(*sp, *manaus) == pytest.approx(haversine_km(*sp, *manaus))
+    nearby = (-23.50, -46.65)
+    assert roads.km_pairwise(*sp, *nearby) == pytest.approx(haversine_km(*sp, *nearby))
+    far = (-10.0, -40.0)
+    assert roads.km_pairwise(*sp, *far) == pytest.approx(haversine_km(*sp, *far))
+
+
+def test_backhaul_scores_use_road_distances(roads):
+    # Campinas driver, Campinas->BH load: detour is measured against the road to BH
+    _, detours = backhaul_scores(
+        -22.90,
+        -47.06,
+        -23.55,
+        -46.63,
+        pickup_km=[5.0],
+        trip_km=[700.0],
+        price_per_km=[10.0],
+        dest_lats=[-19.92],
+        dest_lngs=[-43.94],
+        roads=roads,
+    )
+    road_to_bh = roads.km_pairwise(-22.90, -47.06, -19.92, -43.94)
+    assert road_to_bh == pytest.approx(haversine_km(-22.90, -47.06, -19.92, -43.94) * 1.4, rel=0.01)
+    assert detours[0] == pytest.approx(705.0 - road_to_bh)
+
+
+def test_batch_prices_loads_per_road_km(roads):
+    # Campinas driver heading home to São Paulo, Campinas->BH load paying 7000
+    origin, dest = (-22.91, -47.07), (-19.92, -43.94)
+    straight = haversine_km(*origin, *dest)
+    services = ServiceArrays(
+        ids=np.array([7]),
+        origin_lat=np.array([origin[0]]),
+        origin_lng=np.array([origin[1]]),
+        dest_lat=np.array([dest[0]]),
+        dest_lng=np.array([dest[1]]),
+        offered_price=np.array([7000.0]),
+        trip_km=np.array([straight]),
+        price_per_km=np.array([7000 / straight]),
+        pickup_opens=np.array([-math.inf]),
+        pickup_closes=np.array([math.inf]),
+    )
+    available = Availability(start=0, end=math.inf, speed_kmh=60)
+    intent = (1, -22.90, -47.06, -23.55, -46.63, available)
+    [row] = match_shard([intent], services, 300, 10, str(roads.path))
+
+    road_trip = roads.km_pairwise(*origin, *dest)
+    scores, _ = backhaul_scores(
+        -22.90,
+        -47.06,
+        -23.55,
+        -46.63,
+        pickup_km=roads.km_many(-22.90, -47.06, [origin[0]], [origin[1]]),
+        trip_km=[road_trip],
+        price_per_km=[7000 / road_trip],
+        dest_lats=[dest[0]],
+        dest_lngs=[dest[1]],
+        roads=roads,
+    )
+    assert row["origin_to_dest_km"] == pytest.approx(road_trip, abs=0.01)
+    assert row["score"] == pytest.approx(scores[0], abs=0.01)
+
+
+def test_missing_matrix_falls_back_to_straight_lines(tmp_path):
+    assert open_road_matrix(None) is None
+    assert open_road_matrix(str(tmp_path / "missing.bin")) is None
+    (tmp_path / "bogus.bin").write_bytes(b"x" * 128)
+    assert open_road_matrix(str(tmp_path / "bogus.bin")) is None
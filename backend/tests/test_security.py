@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.security import BoundedExecutor, HasherBusy, verify_and_update_password
+
+
+def test_bounded_executor_fails_fast_when_saturated():
+    executor = BoundedExecutor(workers=1, max_pending=1, name="test")
+    release = threading.Event()
+    running = [executor.submit(release.wait), executor.submit(release.wait)]
+    with pytest.raises(HasherBusy):
+        executor.submit(release.wait)
+    release.set()
+    for future in running:
+        future.result(timeout=5)
+    # Slots are released by done-callbacks, which may run just after result() returns.
+    for _ in range(100):
+        try:
+            assert executor.submit(lambda: 42).result(timeout=5) == 42
+            break
+        except HasherBusy:
+            time.sleep(0.01)
+    else:
+        pytest.fail("executor never freed its slots")
+
+
+def test_login_rehashes_when_cost_changes():
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4).hash("segredo")
+    valid, new_hash = asyncio.run(verify_and_update_password("segredo", old_hash))
+    assert valid
+    assert new_hash.startswith(f"$2b${settings.bcrypt_rounds:02d}$")
+
+    valid, unchanged = asyncio.run(verify_and_update_password("segredo", new_hash))
+    assert valid
+    assert unchanged is None
@@ -0,0 +1,132 @@
+import asyncio
+import math
+import random
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.geo import haversine_km
+from app.services.spatial_index import CorridorIndex, GridIndex, OpenServiceIndex
+from app.services.time_windows import Availability
+
+
+def test_grid_index_matches_brute_force():
+    rng = random.Random(7)
+    points = [(i, rng.uniform(-33, 5), rng.uniform(-73, -35)) for i in range(2000)]
+    index = GridIndex(cell_deg=0.5)
+    index.replace(points)
+
+    for lat, lng, radius in [(-23.55, -46.63, 100), (-3.1, -60.0, 400), (-15.8, -47.9, 5)]:
+        expected = {i for i, plat, plng in points if haversine_km(lat, lng, plat, plng) <= radius}
+        assert {i for i, _ in index.query(lat, lng, radius)} == expected
+
+
+def test_grid_index_upsert_and_remove():
+    index = GridIndex()
+    index.upsert(1, -23.55, -46.63)
+    index.upsert(1, -22.90, -47.06)
+    assert [k for k, _ in index.query(-22.90, -47.06, 1)] == [1]
+    assert index.query(-23.55, -46.63, 1) == []
+    index.remove(1)
+    assert len(index) == 0
+    assert index.query(-22.90, -47.06, 1) == []
+
+
+def test_corridor_index_widens_until_enough_candidates():
+    rng = random.Random(11)
+    points = [
+        (i, rng.uniform(-33, 5), rng.uniform(-73, -35), rng.uniform(-33, 5), rng.uniform(-73, -35))
+        for i in range(3000)
+    ]
+    index = CorridorIndex(cell_deg=0.5)
+    index.replace([(*point, -math.inf, math.inf) for point in points])
+    lat, lng, dest_lat, dest_lng, radius = -23.55, -46.63, -3.1, -60.0, 600
+    in_radius = {i for i, plat, plng, *_ in points if haversine_km(lat, lng, plat, plng) <= radius}
+
+    everything = index.query(lat, lng, dest_lat, dest_lng, radius, len(points))
+    assert {i for i, _ in everything} == in_radius
+
+    few = index.query(lat, lng, dest_lat, dest_lng, radius, 10)
+    assert 10 <= len(few) < len(in_radius) // 5
+    gaps = {i: haversine_km(dest_lat, dest_lng, dlat, dlng) for i, _, _, dlat, dlng in points}
+    assert max(gaps[i] for i, _ in few) < sorted(gaps[i] for i in in_radius)[len(in_radius) // 2]
+    assert all(d == pytest.approx(haversine_km(lat, lng, *points[i][1:3])) for i, d in few)
+
+
+def test_corridor_index_upsert_and_remove():
+    index = CorridorIndex()
+    index.upsert(1, -23.55, -46.63, -22.90, -43.20)
+    index.upsert(1, -23.55, -46.63, -3.10, -60.00)
+    assert [k for k, _ in index.query(-23.55, -46.63, -3.10, -60.00, 10, 1)] == [1]
+    index.remove(1)
+    assert len(index) == 0
+    assert index.query(-23.55, -46.63, -3.10, -60.00, 10, 1) == []
+
+
+def test_corridor_index_filters_and_expires_pickup_windows():
+    index = CorridorIndex()
+    hour = 3600.0
+    index.upsert(1, -23.55, -46.63, -22.90, -43.20, 0, 2 * hour)  # ~5 km away, open now
+    index.upsert(2, -23.55, -46.63, -22.90, -43.20, 30 * hour, 32 * hour)  # opens too late
+    index.upsert(3, -22.90, -47.06, -22.90, -43.20, 0, 0.5 * hour)  # ~80 km, can't make it
+    index.upsert(4, -23.55, -46.63, -22.90, -43.20, -2 * hour, -hour)  # already closed
+    available = Availability(start=0, end=24 * hour, speed_kmh=60)
+
+    hits = index.query(-23.50, -46.63, -22.90, -43.20, 200, 10, available)
+    assert [k for k, _ in hits] == [1]
+    assert {k for k, _ in index.query(-23.50, -46.63, -22.90, -43.20, 200, 10)} == {1, 2, 3, 4}
+
+    index.upsert(1, -23.55, -46.63, -22.90, -43.20, 0, 10 * hour)
+    assert index.expire(now=3 * hour) == 2
+    assert len(index) == 2
+
+
+class _SlowResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _SlowSession:
+    """Stands in for an AsyncSession whose rebuild query takes a while."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def execute(self, statement):
+        self.queries += 1
+        self.started.set()
+        await self.release.wait()
+        return _SlowResult(self.rows)
+
+
+def test_open_service_index_reloads_once_and_keeps_writes_made_meanwhile():
+    now = datetime.utcnow()
+    window = (now, now + timedelta(hours=2))
+    row = namedtuple(
+        "Row",
+        "id origin_lat origin_lng dest_lat dest_lng pickup_window_start pickup_window_end",
+    )
+    stale = [row(1, -23.55, -46.63, -22.90, -43.20, *window)]  # snapshot still has 1, not 2
+    index = OpenServiceIndex(refresh_seconds=60)
+
+    async def scenario():
+        db = _SlowSession(stale)
+        loads = [asyncio.create_task(index.ensure_loaded(db)) for _ in range(5)]
+        await db.started.wait()
+        index.add(2, -23.56, -46.64, -22.90, -43.20, *window)
+        index.remove(1)
+        db.release.set()
+        await asyncio.gather(*loads)
+        return db.queries
+
+    assert asyncio.run(scenario()) == 1
+    assert [k for k, _ in index.query(-23.56, -46.64, 5)] == [2]
+    hits = index.corridors.query(-23.56, -46.64, -22.90, -43.20, 5, 10)
+    assert [k for k, _ in hits] == [2]
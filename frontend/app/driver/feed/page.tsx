@@ -1,10 +1,32 @@
 'use client'
 import { useEffect, useState } from 'react'
 import Link from 'next/link'
-import { api } from '../../../../components/api'
+import { api, API_URL } from '../../../../components/api'
 
 export default function Feed() {
   const [items, setItems] = useState<any[]>([])
-  useEffect(() => { api('/services?status=PUBLICADO').then(r=>r.json()).then(setItems) }, [])
-  return <main><h3>Feed</h3>{items.map(i=><div key={i.id}><Link href={`/driver/services/${i.id}`}>{i.title} - R$ {i.offered_price}</Link></div>)}</main>
+  const [cursor, setCursor] = useState<string | null>(null)
+
+  async function load(after?: string | null) {
+    const r = await api('/services/summary?status=PUBLICADO' + (after ? `&cursor=${after}` : ''))
+    const page = await r.json()
+    setItems(prev => after ? [...prev, ...page] : page)
+    setCursor(r.headers.get('X-Next-Cursor'))
+  }
+
+  useEffect(() => { load() }, [])
+
+  useEffect(() => {
+    let source: EventSource | null = null
+    navigator.geolocation?.getCurrentPosition(({ coords }) => {
+      source = new EventSource(`${API_URL}/services/stream?near_lat=${coords.latitude}&near_lng=${coords.longitude}&radius_km=300`)
+      source.addEventListener('published', e => { const s = JSON.parse((e as MessageEvent).data); setItems(prev => [s, ...prev.filter(i => i.id !== s.id)]) })
+      source.addEventListener('changed', e => { const s = JSON.parse((e as MessageEvent).data); setItems(prev => prev.map(i => i.id === s.id ? s : i)) })
+      source.addEventListener('withdrawn', e => { const s = JSON.parse((e as MessageEvent).data); setItems(prev => prev.filter(i => i.id !== s.id)) })
+      source.addEventListener('resync', () => load())
+    })
+    return () => source?.close()
+  }, [])
+
+  return <main><h3>Feed</h3>{items.map(i=><div key={i.id}><Link href={`/driver/services/${i.id}`}>{i.title} - R$ {i.offered_price}</Link></div>)}{cursor && <button onClick={()=>load(cursor)}>Carregar mais</button>}</main>
 }
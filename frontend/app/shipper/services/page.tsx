@@ -5,9 +5,16 @@ import { api } from '../../../../components/api'
 
 export default function ShipperServices() {
   const [items, setItems] = useState<any[]>([])
-  useEffect(() => {
+  const [cursor, setCursor] = useState<string | null>(null)
+
+  async function load(after?: string | null) {
     const token = localStorage.getItem('token') || ''
-    api('/shipper/my-services', 'GET', token).then(r=>r.json()).then(setItems)
-  }, [])
-  return <main><h3>Meus serviços</h3>{items.map(i=><div key={i.id}><Link href={`/shipper/services/${i.id}`}>{i.title} - {i.status}</Link></div>)}</main>
+    const r = await api('/shipper/my-services' + (after ? `?cursor=${after}` : ''), 'GET', token)
+    const page = await r.json()
+    setItems(prev => after ? [...prev, ...page] : page)
+    setCursor(r.headers.get('X-Next-Cursor'))
+  }
+
+  useEffect(() => { load() }, [])
+  return <main><h3>Meus serviços</h3>{items.map(i=><div key={i.id}><Link href={`/shipper/services/${i.id}`}>{i.title} - {i.status}</Link></div>)}{cursor && <button onClick={()=>load(cursor)}>Carregar mais</button>}</main>
 }